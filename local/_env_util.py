@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+.env.local 读取工具：按文件修改时间缓存解析结果，文件未变化时不再重复读取。
+
+所有 CLI（ask_vs/summary_vs/openvs/gen_* 与 quizit_storage）共用这里的解析器。
+解析方式是整个文件读入后用一个编译好的多行正则匹配，取代了之前逐行读取文件句柄的写法；
+.env.local 只有几十行且结果按 mtime 缓存，一次性读入的内存开销可以忽略。
+"""
+
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# KEY=VALUE 行：跳过以 # 开头的注释行，key 为第一个 "=" 之前的部分
+_ENV_LINE_RE = re.compile(r"^(?![ \t]*#)([^=\r\n]*)=(.*?)\r?$", re.MULTILINE)
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _parse_env_file(path: Path, mtime: Optional[int]) -> Dict[str, str]:
+    # mtime 只用作缓存键：文件被修改后会重新解析
+    values: Dict[str, str] = {}
+    if mtime is None:
+        return values
+    # 整个文件交给一个编译好的正则逐行匹配，不再在 Python 层逐行切分、判断
+    for m in _ENV_LINE_RE.finditer(path.read_text()):
+        values.setdefault(m.group(1).strip(), m.group(2).strip().strip('"').strip("'"))
+    return values
+
+
+def read_env_file(path: Path) -> Dict[str, str]:
+    """解析 KEY=VALUE 行（忽略注释与空行，去掉值两侧引号）；重复的键以首次出现为准。"""
+    return dict(_parse_env_file(path, _mtime(path)))
+
+
+def load_env(path: Path) -> Dict[str, str]:
+    """
+    读取环境变量，合并指定的 .env.local（不覆盖已存在的环境变量）。
+    只缓存文件解析结果；每次调用都按当前 os.environ 重新合并，返回新的 dict，调用方可随意修改。
+    """
+    env = dict(os.environ)
+    for key, value in _parse_env_file(path, _mtime(path)).items():
+        env.setdefault(key, value)
+    return env
+
+
+def get_env_value(path: Path, *names: str) -> Optional[str]:
+    """
+    按 names 顺序取第一个非空的环境变量，都没有时再到 .env.local 中找；
+    导出了但为空的环境变量视为未设置。
+    """
+    for name in names:
+        value = os.environ.get(name)
+        if value:
+            return value
+    values = _parse_env_file(path, _mtime(path))
+    for name in names:
+        value = values.get(name)
+        if value:
+            return value
+    return None
+
+
+__all__ = ["read_env_file", "load_env", "get_env_value"]
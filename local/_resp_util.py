@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+OpenAI Responses API 返回值的通用处理。
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+@lru_cache(maxsize=None)
+def openai_client(api_key: str) -> "OpenAI":
+    """
+    进程内共享的同步 OpenAI 客户端：多线程、多轮请求复用同一 keep-alive 连接池。
+    装了 h2（pip install "httpx[http2]"）时开启 HTTP/2，否则退回 HTTP/1.1。
+    """
+    import httpx
+    from openai import OpenAI, DefaultHttpxClient
+
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        http2 = False
+    else:
+        http2 = True
+    http_client = DefaultHttpxClient(
+        http2=http2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    )
+    return OpenAI(api_key=api_key, http_client=http_client)
+
+
+def extract_text(resp) -> Optional[str]:
+    """优先取 resp.output_text；缺失时回退到 output[*].content[*] 中第一个 output_text 片段。"""
+    text = getattr(resp, "output_text", None)
+    if text:
+        return text
+    # 每个 item/part 的属性只取一次（SDK 的 pydantic 模型属性访问并不便宜）
+    for item in getattr(resp, "output", None) or ():
+        for part in getattr(item, "content", None) or ():
+            if getattr(part, "type", None) == "output_text":
+                text = getattr(part, "text", None)
+                if text:
+                    return text
+    return None
+
+
+def stream_text(
+    client,
+    on_delta: Optional[Callable[[str], None]] = None,
+    on_final: Optional[Callable[[Any], None]] = None,
+    **kwargs,
+) -> Optional[str]:
+    """
+    以流式方式调用 client.responses，边接收边回调 on_delta，结束后返回完整文本。
+    on_final 会收到最终的完整响应对象（例如没有文本时用于打印原始响应）。
+    kwargs 原样传给 responses.stream（model/input/tools 等）。
+    """
+    chunks: list[str] = []
+    with client.responses.stream(**kwargs) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                chunks.append(event.delta)
+                if on_delta:
+                    on_delta(event.delta)
+        final = stream.get_final_response()
+    if on_final:
+        on_final(final)
+    return "".join(chunks) or extract_text(final)
+
+
+__all__ = ["openai_client", "extract_text", "stream_text"]
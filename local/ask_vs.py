@@ -7,33 +7,43 @@
 """
 
 import argparse
-import os
 import sys
 from pathlib import Path
 from typing import Optional
 
-from openai import OpenAI, APIError
+from openai import APIError
+
+import resp_cache
+from _env_util import get_env_value
+from _resp_util import openai_client, stream_text
 
 ENV_LOCAL_PATH = Path(__file__).resolve().parent.parent / ".env.local"
 
 
 def load_api_key() -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key and ENV_LOCAL_PATH.exists():
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            if line.strip().startswith("OPENAI_API_KEY="):
-                api_key = line.split("=", 1)[1].strip().strip('"').strip("'")
-                break
+    api_key = get_env_value(ENV_LOCAL_PATH, "OPENAI_API_KEY")
     if not api_key:
         print("❌ 请设置 OPENAI_API_KEY 环境变量或在 .env.local 中提供。", file=sys.stderr)
         sys.exit(1)
     return api_key
 
 
-def ask(store_id: str, question: str, model: str, max_tokens: int) -> None:
-    client = OpenAI(api_key=load_api_key())
+def ask(store_id: str, question: str, model: str, max_tokens: int, use_cache: bool = True) -> None:
+    cache_key = resp_cache.make_key(model, store_id, question)
+    if use_cache:
+        cached = resp_cache.get(cache_key)
+        if cached is not None:
+            print(cached)
+            return
+
+    # REPL 多轮提问共用一个客户端
+    client = openai_client(load_api_key())
+    finals: list = []
     try:
-        resp = client.responses.create(
+        text = stream_text(
+            client,
+            on_delta=lambda delta: print(delta, end="", flush=True),
+            on_final=finals.append,
             model=model,
             input=question,
             max_output_tokens=max_tokens,
@@ -43,28 +53,14 @@ def ask(store_id: str, question: str, model: str, max_tokens: int) -> None:
         print(f"❌ 调用接口失败: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # 安全提取文本输出
-    text = getattr(resp, "output_text", None)
-    if not text and getattr(resp, "output", None):
-        try:
-            # 尝试从 output 列表提取 text 字段
-            for item in resp.output:
-                if hasattr(item, "content"):
-                    for part in item.content:
-                        if getattr(part, "type", "") == "output_text":
-                            text = getattr(part, "text", None)
-                            if text:
-                                break
-                if text:
-                    break
-        except Exception:
-            text = None
-
     if text:
-        print(text)
+        # 被截断（max_output_tokens）等未完成的回答不缓存，下次重新请求
+        if finals and getattr(finals[0], "status", None) == "completed":
+            resp_cache.put(cache_key, text)
+        print()
     else:
         print("未获得文本回复，原始响应：")
-        print(resp)
+        print(finals[0] if finals else None)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -85,6 +81,11 @@ def build_parser() -> argparse.ArgumentParser:
         default=8000,
         help="最大输出 tokens，默认 8000",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="不使用本地响应缓存（tmp/resp_cache），强制重新请求",
+    )
     return parser
 
 
@@ -98,7 +99,7 @@ def main(argv: Optional[list[str]] = None) -> None:
             break
         if not question:
             continue
-        ask(args.store_id, question, args.model, args.max_tokens)
+        ask(args.store_id, question, args.model, args.max_tokens, use_cache=not args.no_cache)
         print("-" * 40)
 
 
@@ -12,15 +12,19 @@ import argparse
 import json
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
 from typing import Optional, Dict
 
 from openai import OpenAI, APIError
 
+import resp_cache
+from _resp_util import openai_client, stream_text
 from quizit_storage import (
     load_env,
-    upload_to_storage,
-    fetch_cards_by_deck_title,
+    DeckUploadQueue,
+    iter_cards_by_deck_title,
     find_deck_by_title,
 )
 
@@ -30,11 +34,11 @@ def get_openai_client(env: Dict[str, str]) -> OpenAI:
     if not api_key:
         print("❌ 请设置 OPENAI_API_KEY（环境变量或 .env.local）", file=sys.stderr)
         sys.exit(1)
-    return OpenAI(api_key=api_key)
+    return openai_client(api_key)
 
 
-def generate_graph_prompt(keyword: str) -> str:
-    return f'''
+# 提示词主体固定不变，预先拼好，每次只追加知识点
+_GRAPH_PROMPT_PREFIX = '''
 请根据以下规范，为指定历史知识点生成 GraphViz DOT 文件，用于构建紧凑、美观、统一的小型知识图谱。
 
 【全局布局要求】
@@ -91,8 +95,12 @@ def generate_graph_prompt(keyword: str) -> str:
 
 【任务】
 请根据以上规范，为以下知识点生成 GraphViz DOT 文件：
-{keyword}
-    '''
+'''
+_GRAPH_PROMPT_SUFFIX = "\n    "
+
+
+def generate_graph_prompt(keyword: str) -> str:
+    return _GRAPH_PROMPT_PREFIX + keyword + _GRAPH_PROMPT_SUFFIX
 
 
 def sanitize_dot_output(text: Optional[str]) -> Optional[str]:
@@ -121,13 +129,21 @@ def fetch_graph(
     keyword: str,
     model: str,
     max_tokens: int,
+    use_cache: bool = True,
 ) -> Optional[str]:
     if not keyword:
         return None
+    prompt = generate_graph_prompt(keyword)
+    cache_key = resp_cache.make_key(model, store_id, prompt)
+    if use_cache:
+        cached = resp_cache.get(cache_key)
+        if cached is not None:
+            return sanitize_dot_output(cached)
     try:
-        resp = oa_client.responses.create(
+        text = stream_text(
+            oa_client,
             model=model,
-            input=generate_graph_prompt(keyword),
+            input=prompt,
             max_output_tokens=max_tokens,
             tools=[{"type": "file_search", "vector_store_ids": [store_id]}],
         )
@@ -135,21 +151,10 @@ def fetch_graph(
         print(f"⚠️ 调用 OpenAI 失败（{keyword}）: {e}", file=sys.stderr)
         return None
 
-    text = getattr(resp, "output_text", None)
-    if not text and getattr(resp, "output", None):
-        try:
-            for item in resp.output:
-                if hasattr(item, "content"):
-                    for part in item.content:
-                        if getattr(part, "type", "") == "output_text":
-                            text = getattr(part, "text", None)
-                            if text:
-                                break
-                if text:
-                    break
-        except Exception:
-            text = None
-    return sanitize_dot_output(text)
+    graph = sanitize_dot_output(text)
+    if graph:
+        resp_cache.put(cache_key, graph)
+    return graph
 
 
 def main(argv: Optional[list[str]] = None) -> None:
@@ -157,52 +162,78 @@ def main(argv: Optional[list[str]] = None) -> None:
     parser.add_argument("--title", required=True, help="deck 的 title，需精确匹配")
     parser.add_argument("--store-id", required=False, help="vector store id，用于查询定义；不提供时不调用 OpenAI")
     parser.add_argument("--model", default="gpt-5-mini", help="OpenAI 模型，默认 gpt-5-mini")
-    parser.add_argument("--max-tokens", type=int, default=8000, help="定义输出最大 tokens，默认 8000")
+    parser.add_argument("--max-tokens", type=int, default=2500, help="定义输出最大 tokens，默认 2500")
+    parser.add_argument("--no-cache", action="store_true", help="不使用本地响应缓存（tmp/resp_cache），强制重新请求")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求 OpenAI 的线程数，默认 8")
     args = parser.parse_args(argv)
 
     env = load_env()
     oa_client = get_openai_client(env) if args.store_id else None
-    cards = fetch_cards_by_deck_title(args.title)
-    if not cards:
+    cards_iter = iter_cards_by_deck_title(args.title)
+    first = next(cards_iter, None)
+    if first is None:
         print(f"未找到 deck 或该 deck 无卡片：{args.title}")
         sys.exit(0)
+    cards = chain([first], cards_iter)
     deck = find_deck_by_title(args.title)
 
-    cache_dir = Path("tmp/dots")
-    cache_dir.mkdir(parents=True, exist_ok=True)
+    queue = DeckUploadQueue(Path("tmp/dots"), ".dot")
 
-    ordered = []
-    for card in cards:
+    def save_graph(card: dict, graph: str) -> dict:
         cid = card["id"]
-        raw_kw = str(card.get("front") or "")
-        keyword = raw_kw.strip().splitlines()[-1].strip() if raw_kw.strip() else ""
-        if keyword:
-            print(f"processing {keyword} ...")
-            dot_path = cache_dir / f"{cid}.dot"
-            if dot_path.exists():
-                graph = dot_path.read_text(encoding="utf-8")
-                print("found local graph dot file")
-            elif oa_client and args.store_id:
-                graph = fetch_graph(
-                    oa_client,
-                    args.store_id,
-                    f"{keyword}:{card.get('back') or ''}",
-                    args.model,
-                    args.max_tokens,
-                )
-            else:
-                print(f"⚠️ 未提供 store-id 且本地无 {dot_path.name}，跳过 {cid}")
-                graph = None
-            if graph:
-                if not dot_path.exists():
-                    dot_path.write_text(graph, encoding="utf-8")
-                upload_to_storage(cid, graph.encode("utf-8"), "back.dot")
+        queue.save_local(cid, graph)
+        queue.enqueue(cid, graph.encode("utf-8"), "back.dot")
+        card = dict(card)
+        card["graph"] = graph
+        return card
+
+    # 边分页读取卡片边处理：本地已有 dot 的直接排队上传，其余立即提交给线程池并发调用 OpenAI
+    ordered: list[dict] = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = {}
+            for pos, card in enumerate(cards):
+                ordered.append(card)
+                cid = card["id"]
+                raw_kw = str(card.get("front") or "")
+                keyword = raw_kw.strip().splitlines()[-1].strip() if raw_kw.strip() else ""
+                if not keyword:
+                    continue
+                print(f"processing {keyword} ...")
+                dot_path = queue.local_path(cid)
+                if queue.has_local(cid):
+                    print("found local graph dot file")
+                    ordered[pos] = save_graph(card, dot_path.read_text(encoding="utf-8"))
+                elif oa_client and args.store_id:
+                    future = executor.submit(
+                        fetch_graph,
+                        oa_client,
+                        args.store_id,
+                        f"{keyword}:{card.get('back') or ''}",
+                        args.model,
+                        args.max_tokens,
+                        not args.no_cache,
+                    )
+                    futures[future] = (pos, card)
+                else:
+                    print(f"⚠️ 未提供 store-id 且本地无 {dot_path.name}，跳过 {cid}")
+
+            for future in as_completed(futures):
+                pos, card = futures[future]
+                try:
+                    graph = future.result()
+                except Exception as e:
+                    # 单张失败（如流式读取中断）不影响其他卡片
+                    print(f"⚠️ 生成 graph 失败（{card['id']}）: {e}", file=sys.stderr)
+                    continue
+                if graph:
+                    ordered[pos] = save_graph(card, graph)
+    finally:
+        # 中途出错时也要把已生成的文件上传并记录清单
+        for (cid, _, _), uploaded in zip(queue.items, queue.flush()):
+            if uploaded:
                 print(f"graph saved to card {cid}.")
 
-                card = dict(card)
-                card["graph"] = graph
-        ordered.append(card)
-
     print(json.dumps({
         "title": deck["title"] if deck else args.title,
         "count": len(ordered),
@@ -9,6 +9,7 @@
 
 import argparse
 import json
+import re
 import sys
 from pathlib import Path
 from typing import List, Optional, Tuple
@@ -17,37 +18,20 @@ from gen_image import generate_image_bytes, guess_subject_from_title
 from quizit_storage import fetch_cards_by_deck_title, upload_to_storage  # 同目录引用
 
 
+# ![alt](url) 或 ![alt]；url 部分可选
+_MD_IMAGE_RE = re.compile(r"!\[([^\]]*)\](?:\(([^)]*)\))?")
+
+
 def extract_markdown_images(text: str) -> List[Tuple[Optional[str], Optional[str]]]:
     """
     提取 markdown 图片语法：
     - ![alt](url) → (alt, url)
     - ![alt]      → (alt, None)
     """
-    results: List[Tuple[Optional[str], Optional[str]]] = []
-    i = 0
-    while i < len(text):
-        bang = text.find("![", i)
-        if bang == -1:
-            break
-        close_bracket = text.find("]", bang + 2)
-        if close_bracket == -1:
-            break
-
-        alt_text = text[bang + 2 : close_bracket].strip()
-        url: Optional[str] = None
-
-        if close_bracket + 1 < len(text) and text[close_bracket + 1] == "(":
-            close_paren = text.find(")", close_bracket + 2)
-            if close_paren != -1:
-                url = text[close_bracket + 2 : close_paren].strip()
-                i = close_paren + 1
-            else:
-                i = close_bracket + 2
-        else:
-            i = close_bracket + 1
-
-        results.append((alt_text or None, url or None))
-    return results
+    return [
+        (m.group(1).strip() or None, (m.group(2) or "").strip() or None)
+        for m in _MD_IMAGE_RE.finditer(text)
+    ]
 
 
 def extract_back(back_raw: str) -> Tuple[str, List[Tuple[Optional[str], Optional[str]]]]:
@@ -74,14 +58,7 @@ def extract_back(back_raw: str) -> Tuple[str, List[Tuple[Optional[str], Optional
     image_infos = extract_markdown_images(back_text) if back_text else []
 
     # 去重保持顺序
-    seen = set()
-    deduped: List[Tuple[Optional[str], Optional[str]]] = []
-    for info in image_infos:
-        key = (info[0] or "", info[1] or "")
-        if key not in seen:
-            seen.add(key)
-            deduped.append(info)
-    return back_text, deduped
+    return back_text, list(dict.fromkeys(image_infos))
 
 
 def main(argv: Optional[List[str]] = None) -> None:
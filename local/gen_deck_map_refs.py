@@ -12,28 +12,59 @@
 import argparse
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 from openai import OpenAI, APIError
+from pydantic import BaseModel, ValidationError  # openai SDK 自带 pydantic v2
 
+import resp_cache
+from _resp_util import openai_client, stream_text
 from quizit_storage import (
     load_env,
-    upload_to_storage,
-    fetch_cards_by_deck_title,
+    DeckUploadQueue,
+    iter_cards_by_deck_title,
     find_deck_by_title,
 )
 
+try:
+    import orjson  # pip install orjson，可选；未安装时退回标准库 json
+except ImportError:
+    orjson = None
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
+_REASONING_MODEL_PREFIXES = ("gpt-5", "o1", "o3", "o4")
 MAP_INDEX_HEADER = "章节标题,图片名称,页码,位置"
 
 
+class MapRef(BaseModel):
+    """单条地图册引用，即上传到 storage 的 back{idx}.map 内容。"""
+
+    map_file: str
+    name: str
+    page: int
+    position: str
+
+
+def _json_dumps(obj) -> bytes:
+    """缩进 2 格、保留中文的 UTF-8 JSON 字节。"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _json_loads(text: str):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
 def get_openai_client(env: Dict[str, str]) -> Optional[OpenAI]:
     api_key = env.get("OPENAI_API_KEY")
     if not api_key:
         print("⚠️ 未设置 OPENAI_API_KEY，将跳过在线生成", file=sys.stderr)
         return None
-    return OpenAI(api_key=api_key)
+    return openai_client(api_key)
 
 def load_map_index_csv(map_index_path: Path) -> str:
     if not map_index_path.exists():
@@ -61,7 +92,7 @@ def load_map_index_csv(map_index_path: Path) -> str:
 
 def build_system_prompt(map_index_csv: str, map_file: str) -> str:
     return f'''
-你是一名初中地理教师。我将提供给你一张知识卡片的内容，你需要根据我给出的《地图册图片索引表》为该卡片挑选出相关的图片。
+你是一名初中地理教师。我将提供给你若干张知识卡片的内容（每张带有卡片 ID），你需要根据我给出的《地图册图片索引表》为每张卡片挑选出相关的图片。
 
 下面是 csv 格式的《地图册图片索引表》：
 
@@ -71,58 +102,103 @@ def build_system_prompt(map_index_csv: str, map_file: str) -> str:
 
 任务要求如下：
 
-1. 从索引表中自动选择 **1～3 张最符合卡片核心知识点** 的地图。
-2. 输出格式必须是 JSON 数组。
-3. 每个元素必须使用以下固定结构（map_file 固定为 "{map_file}"）：
+1. 为每张卡片从索引表中自动选择 **1～3 张最符合卡片核心知识点** 的地图。
+2. 输出格式必须是 JSON 对象：键为卡片 ID（原样照抄），值为该卡片的关联图片数组。
+3. 数组中每个元素必须使用以下固定结构（map_file 固定为 "{map_file}"）：
 
 {{
-  "map_file": "{map_file}",
-  "name": "<图片名称>",
-  "page": <页码数字>,
-  "position": "<图片在该页的位置>"
+  "<卡片ID>": [
+    {{
+      "map_file": "{map_file}",
+      "name": "<图片名称>",
+      "page": <页码数字>,
+      "position": "<图片在该页的位置>"
+    }}
+  ]
 }}
 
 4. 严格只输出 JSON，不要解释过程，不要加入多余文字。
 5. 如果挑出多张图片，这些图片跟内容的相关度应基本一致，否则就只输出相关性最高的那一张图片。
 
 '''
-def generate_map_ref_prompt(card_info: str) -> str:
-    return f'''
-请根据下面的卡片内容，从《地图册图片索引表》挑出密切相关的图片，自动生成关联图片数组：
-[卡片内容]
-    {card_info}'''
+
+
+_MAP_REF_PROMPT_HEADER = (
+    "\n请根据下面的卡片内容，从《地图册图片索引表》为每张卡片挑出密切相关的图片，"
+    "按卡片 ID 生成关联图片数组：\n"
+)
+
+
+def generate_map_ref_prompt(cards: List[Tuple[str, str]]) -> str:
+    """cards 为 (卡片 ID, 卡片内容) 列表，按编号逐张列出。"""
+    return _MAP_REF_PROMPT_HEADER + "\n".join(
+        f"[卡片 {i}] ID: {cid}\n    {card_info}"
+        for i, (cid, card_info) in enumerate(cards, start=1)
+    )
+
+
+def split_map_refs(text: Optional[str], card_ids: List[str]) -> Optional[Dict[str, str]]:
+    """
+    把批量结果 {cid: [...]} 拆成每张卡片各自的 JSON 数组文本。
+    结果不是 JSON 对象时返回 None；只有一张卡片时容忍模型写错键名。
+    """
+    if not text:
+        return None
+    try:
+        parsed = _json_loads(text)
+    except Exception:
+        return None
+    if not isinstance(parsed, dict):
+        return None
+    if len(card_ids) == 1 and card_ids[0] not in parsed and len(parsed) == 1:
+        parsed = {card_ids[0]: next(iter(parsed.values()))}
+    return {
+        cid: _json_dumps(parsed[cid]).decode("utf-8")
+        for cid in card_ids
+        if isinstance(parsed.get(cid), list)
+    }
+
+
+def map_refs_cache_key(model: str, system_prompt: str, cards: List[Tuple[str, str]]) -> str:
+    return resp_cache.make_key(model, system_prompt, generate_map_ref_prompt(cards))
+
 
 def make_map_refs(
     oa_client: OpenAI,
     system_prompt: str,
-    keyword: str,
+    cards: List[Tuple[str, str]],
     model: str,
+    prompt_cache_key: Optional[str] = None,
+    use_cache: bool = True,
+    max_tokens_per_card: int = 400,
+    reasoning_effort: Optional[str] = "low",
 ) -> Optional[str]:
-    if not keyword:
-        return None
-    try:
-        resp = oa_client.responses.create(
-            model=model,
-            input=f"{system_prompt}\n\n{generate_map_ref_prompt(keyword)}",
-        )
-    except APIError as e:
-        print(f"⚠️ 调用 OpenAI 失败（{keyword}）: {e}", file=sys.stderr)
+    """
+    请求一批卡片的地图引用，返回原始文本；命中本地缓存时不请求接口。
+    写缓存由调用方在结果能按卡片拆开后进行，无法解析的回复不缓存。
+    """
+    if not cards:
         return None
-
-    text = getattr(resp, "output_text", None)
-    if not text and getattr(resp, "output", None):
-        try:
-            for item in resp.output:
-                if hasattr(item, "content"):
-                    for part in item.content:
-                        if getattr(part, "type", "") == "output_text":
-                            text = getattr(part, "text", None)
-                            if text:
-                                break
-                if text:
-                    break
-        except Exception:
-            text = None
+    if use_cache:
+        cached = resp_cache.get(map_refs_cache_key(model, system_prompt, cards))
+        if cached is not None:
+            return cached
+    # system_prompt 在一次运行内保持不变，放到 instructions 中作为固定前缀，命中服务端 prompt cache
+    extra = {"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {}
+    # 只有推理模型接受 reasoning 参数，gpt-4o/gpt-4.1 等传了会直接 400
+    if reasoning_effort and model.startswith(_REASONING_MODEL_PREFIXES):
+        extra["reasoning"] = {"effort": reasoning_effort}
+    # 接口错误（APIError）直接抛给调用方，以便与“返回内容无法解析”区分开
+    text = stream_text(
+        oa_client,
+        model=model,
+        instructions=system_prompt,
+        input=generate_map_ref_prompt(cards),
+        # 选图是纯分类任务：输出只有少量 JSON，压低推理强度（reasoning_effort）和输出上限
+        max_output_tokens=max_tokens_per_card * len(cards),
+        text={"format": {"type": "json_object"}},
+        **extra,
+    )
     return text
 
 
@@ -132,6 +208,15 @@ def main(argv: Optional[list[str]] = None) -> None:
     parser.add_argument("--map-file", required=True, help='地图文件目录名，例如 "geo_8_1"')
     parser.add_argument("--map-index-file", required=True, help='地图索引文件路径，例如 "docs/geography_8a_maps.md"')
     parser.add_argument("--model", default="gpt-5-mini", help="OpenAI 模型，默认 gpt-5-mini")
+    parser.add_argument("--max-tokens", type=int, default=400, help="每张卡片的输出 tokens 上限（按批次卡片数累加），默认 400")
+    parser.add_argument("--no-cache", action="store_true", help="不使用本地响应缓存（tmp/resp_cache），强制重新请求")
+    parser.add_argument(
+        "--reasoning-effort",
+        default="low",
+        help="推理模型（gpt-5*/o 系列）的推理强度，默认 low；传空字符串则不发送该参数",
+    )
+    parser.add_argument("--batch-size", type=int, default=10, help="每次请求合并的卡片数，默认 10")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求 OpenAI 的线程数，默认 8")
     args = parser.parse_args(argv)
 
     if "地理" not in args.title:
@@ -150,72 +235,140 @@ def main(argv: Optional[list[str]] = None) -> None:
     oa_client = get_openai_client(env)
     map_index_csv = load_map_index_csv(map_index_path)
     system_prompt = build_system_prompt(map_index_csv, map_file)
-    cards = fetch_cards_by_deck_title(args.title)
-    if not cards:
+    cards_iter = iter_cards_by_deck_title(args.title)
+    first = next(cards_iter, None)
+    if first is None:
         print(f"未找到 deck 或该 deck 无卡片：{args.title}")
         sys.exit(0)
+    cards = chain([first], cards_iter)
     deck = find_deck_by_title(args.title)
 
-    cache_dir = Path("tmp/maps")
-    cache_dir.mkdir(parents=True, exist_ok=True)
+    queue = DeckUploadQueue(Path("tmp/maps"), ".map")
 
-    ordered = []
-    for card in cards:
+    def save_map_refs(card: dict, map_ref_text: str) -> dict:
         cid = card["id"]
         front = card.get("front")
-        assert front
-
-        print(f"processing {front} ...")
-        map_path = cache_dir / f"{cid}.map"
-        map_ref_text: Optional[str]
-        if map_path.exists():
-            map_ref_text = map_path.read_text(encoding="utf-8")
-            print("found local map ref file")
-        elif oa_client:
-            map_ref_text = make_map_refs(
+        map_ref_parsed = None
+        try:
+            map_ref_parsed = _json_loads(map_ref_text)
+        except Exception:
+            map_ref_parsed = None
+
+        if isinstance(map_ref_parsed, list):
+            valid_refs = []
+            for idx, ref in enumerate(map_ref_parsed):
+                try:
+                    ref_obj = MapRef.model_validate(ref)
+                except ValidationError as e:
+                    print(f"⚠️ map ref #{idx} 格式不正确，已跳过 ({cid}): {e.errors()[0]['msg']}")
+                    continue
+                if ref_obj.map_file != map_file:
+                    print(f"⚠️ map ref #{idx} 的 map_file={ref_obj.map_file!r} 与 {map_file!r} 不符，已跳过 ({cid})")
+                    continue
+                valid_refs.append(ref_obj)
+            if valid_refs:
+                # 本地缓存写校验后的结果（如 "page": "3" 已转成 3），与上传到 storage 的内容一致；
+                # 文件按有效条目重新编号，重跑时读本地缓存得到的文件名也不变
+                dumped = [ref_obj.model_dump() for ref_obj in valid_refs]
+                queue.save_local(cid, _json_dumps(dumped).decode("utf-8"))
+                for i, ref_obj in enumerate(valid_refs):
+                    queue.enqueue(cid, ref_obj.model_dump_json(indent=2).encode("utf-8"), f"back{i}.map")
+                card = dict(card)
+                card["map"] = dumped
+                print(f"map refs ready for card {cid} ({len(valid_refs)} files).")
+            else:
+                queue.save_local(cid, map_ref_text)
+                print(map_ref_text)
+                print(f"{front}:{card.get('back') or ''}")
+                print(f"⚠️ 未找到有效 map ref，未上传 ({cid})")
+        else:
+            queue.save_local(cid, map_ref_text)
+            queue.enqueue(cid, map_ref_text.encode("utf-8"), "back.map")
+            print(f"map ref ready for card {cid}.")
+            card = dict(card)
+            card["map"] = map_ref_text
+        return card
+
+    def run_batch(batch: List[Tuple[int, dict, str]]) -> List[Tuple[int, dict, Optional[str]]]:
+        items = [(card["id"], kw) for _, card, kw in batch]
+        try:
+            text = make_map_refs(
                 oa_client,
                 system_prompt,
-                f"{front}:{card.get('back') or ''}",
+                items,
                 args.model,
+                f"{map_file}_map_refs_v1",
+                not args.no_cache,
+                args.max_tokens,
+                args.reasoning_effort,
             )
+        except APIError as e:
+            # 调用本身失败（限流、鉴权等）时逐卡重试只会成倍放大请求，整批跳过
+            print(f"⚠️ 调用 OpenAI 失败（{'、'.join(cid for cid, _ in items)}）: {e}", file=sys.stderr)
+            return [(pos, card, None) for pos, card, _ in batch]
+        per_card = split_map_refs(text, [cid for cid, _ in items])
+        if per_card is None:
+            if len(batch) == 1:
+                # 单卡仍无法解析时保留原文，交给 save_map_refs 按旧格式处理
+                pos, card, _ = batch[0]
+                return [(pos, card, text)]
+            per_card = {}
         else:
-            print(f"⚠️ 未提供 OpenAI 配置且本地无 {map_path.name}，跳过 {cid}")
-            map_ref_text = None
-        if map_ref_text:
-            if not map_path.exists():
-                map_path.write_text(map_ref_text, encoding="utf-8")
-            map_ref_parsed = None
-            try:
-                map_ref_parsed = json.loads(map_ref_text)
-            except Exception:
-                map_ref_parsed = None
-
-            if isinstance(map_ref_parsed, list):
-                valid_refs = []
-                for idx, ref in enumerate(map_ref_parsed):
-                    if not isinstance(ref, dict):
-                        print(f"⚠️ map ref #{idx} 不是对象，已跳过 ({cid})")
-                        continue
-                    if not all(k in ref for k in ("map_file", "name", "page", "position")):
-                        print(f"⚠️ map ref #{idx} 缺少字段，已跳过 ({cid})")
-                        continue
-                    ref_content = json.dumps(ref, ensure_ascii=False, indent=2)
-                    upload_to_storage(cid, ref_content.encode("utf-8"), f"back{idx}.map")
-                    valid_refs.append(ref)
-                if valid_refs:
-                    card = dict(card)
-                    card["map"] = valid_refs
-                    print(f"map refs saved to card {cid} ({len(valid_refs)} files).")
-                else:
-                    print(map_ref_text)
-                    print(f"{front}:{card.get('back') or ''}")
-                    print(f"⚠️ 未找到有效 map ref，未上传 ({cid})")
+            # 只缓存能按卡片拆开的回复，否则重跑时会重放坏结果并再次逐卡回退
+            resp_cache.put(map_refs_cache_key(args.model, system_prompt, items), text)
+        results: List[Tuple[int, dict, Optional[str]]] = []
+        for item in batch:
+            pos, card, _ = item
+            ref_text = per_card.get(card["id"])
+            if ref_text is None and len(batch) > 1:
+                # 批量结果缺失或解析失败的卡片，退回单卡请求
+                results.extend(run_batch([item]))
             else:
-                upload_to_storage(cid, map_ref_text.encode("utf-8"), "back.map")
-                print(f"map ref saved to card {cid}.")
-                card = dict(card)
-                card["map"] = map_ref_text
-        ordered.append(card)
+                results.append((pos, card, ref_text))
+        return results
+
+    # 边分页读取卡片边处理：本地已有 map 的直接排队上传，其余凑满一批就提交给线程池
+    batch_size = max(1, args.batch_size)
+    ordered: list[dict] = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = []
+            pending: List[Tuple[int, dict, str]] = []
+            for pos, card in enumerate(cards):
+                ordered.append(card)
+                cid = card["id"]
+                front = card.get("front")
+                assert front
+
+                print(f"processing {front} ...")
+                map_path = queue.local_path(cid)
+                if queue.has_local(cid):
+                    print("found local map ref file")
+                    ordered[pos] = save_map_refs(card, map_path.read_text(encoding="utf-8"))
+                elif oa_client:
+                    pending.append((pos, card, f"{front}:{card.get('back') or ''}"))
+                    if len(pending) >= batch_size:
+                        futures.append(executor.submit(run_batch, pending))
+                        pending = []
+                else:
+                    print(f"⚠️ 未提供 OpenAI 配置且本地无 {map_path.name}，跳过 {cid}")
+            if pending:
+                futures.append(executor.submit(run_batch, pending))
+
+            for future in as_completed(futures):
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    # 一批失败（如流式读取中断）不影响其他批次
+                    print(f"⚠️ 生成 map ref 失败: {e}", file=sys.stderr)
+                    continue
+                for pos, card, map_ref_text in batch_results:
+                    if map_ref_text:
+                        ordered[pos] = save_map_refs(card, map_ref_text)
+    finally:
+        # 中途出错时也要把已生成的文件上传并记录清单
+        results = queue.flush()
+        print(f"map files saved: {sum(1 for r in results if r)}/{len(queue.items)}")
 
     print(json.dumps({
         "title": deck["title"] if deck else args.title,
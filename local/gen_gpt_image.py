@@ -14,7 +14,6 @@
 
 import argparse
 import base64
-import os
 import sys
 import traceback
 from pathlib import Path
@@ -23,19 +22,15 @@ from urllib.parse import urlparse
 
 from openai import OpenAI
 
+from _env_util import get_env_value
+
 DEFAULT_MODEL = "gpt-image-1.5"
 ENV_LOCAL_PATH = Path(__file__).resolve().parent / ".env.local"
 
 
 def load_openai_api_key() -> str:
     """参考 gen_image.py 逻辑，支持环境变量与 .env.local。"""
-    key = os.getenv("OPENAI_API_KEY")
-    if not key and ENV_LOCAL_PATH.exists():
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            stripped = line.strip()
-            if stripped.startswith("OPENAI_API_KEY="):
-                key = stripped.split("=", 1)[1].strip().strip('"').strip("'")
-                break
+    key = get_env_value(ENV_LOCAL_PATH, "OPENAI_API_KEY")
     if not key:
         print("❌ 请设置 OPENAI_API_KEY 环境变量或在 .env.local 中提供。", file=sys.stderr)
         sys.exit(1)
@@ -7,21 +7,37 @@
 
 依赖：
   pip install google-genai
+  pip install pillow（可选替换为 pillow-simd：CC="cc -mavx2" pip install -U --force-reinstall pillow-simd，
+  基于 libjpeg-turbo + AVX2，JPEG 编码与 LANCZOS 缩放明显更快，接口完全兼容）
 
 所需环境变量：
   GOOGLE_API_KEY   或在仓库根目录 .env.local 中提供同名字段
 """
 
 import argparse
+import asyncio
 import base64
+import math
 import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional, Union
 
 from PIL import Image  # pillow 必须安装，否则直接抛异常
 
+try:
+    from google import genai  # 仅生成图片时需要；只用压缩等工具函数时可以不装
+    _GENAI_AVAILABLE = True
+except ImportError:
+    genai = None
+    _GENAI_AVAILABLE = False
+
+from _env_util import get_env_value
+
 DEFAULT_MODEL = "gemini-2.5-flash-image"
 # DEFAULT_MODEL = "imagen-4.0-generate-001"
 # DEFAULT_MODEL = "gemini-3-pro-image-preview"
@@ -29,14 +45,9 @@ DEFAULT_MODEL = "gemini-2.5-flash-image"
 ENV_LOCAL_PATH = Path(__file__).resolve().parent / ".env.local"
 
 
+@lru_cache(maxsize=1)
 def load_google_api_key() -> str:
-    key = os.getenv("GOOGLE_API_KEY") or os.getenv("GOOLE_API_KEY")
-    if not key and ENV_LOCAL_PATH.exists():
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            stripped = line.strip()
-            if stripped.startswith("GOOGLE_API_KEY=") or stripped.startswith("GOOLE_API_KEY="):
-                key = stripped.split("=", 1)[1].strip().strip('"').strip("'")
-                break
+    key = get_env_value(ENV_LOCAL_PATH, "GOOGLE_API_KEY", "GOOLE_API_KEY")
     if not key:
         print("❌ 请设置 GOOGLE_API_KEY 环境变量或在 .env.local 中提供。", file=sys.stderr)
         sys.exit(1)
@@ -49,61 +60,123 @@ def save_image_from_b64(data_b64: str, out_path: Path) -> None:
     out_path.write_bytes(raw)
 
 
+# Gemini/Imagen 在 4:3 下的常见输出尺寸；这类图细节平滑，首轮可直接用更高质量试编码
+_KNOWN_GENAI_SIZES = {(1024, 768), (1184, 864)}
+
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    """转成 RGB；已是 RGB 时原样返回，带透明通道时先铺白底再合成。"""
+    if img.mode == "RGB":
+        return img
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _search_quality(
+    work: Image.Image,
+    jpeg_bytes: Callable[[Image.Image, int], bytes],
+    base_quality: int,
+    base_data: bytes,
+    min_quality: int,
+    target_bytes: int,
+) -> bytes:
+    """
+    在 base_quality 以下二分查找能压到目标内的最高质量。
+    已知 base_quality 只是略微超标，先在其下 16 档内找，找不到再放宽到 min_quality；
+    同一质量只编码一次。
+    """
+    tried = {base_quality: base_data}
+
+    def encode(q: int) -> bytes:
+        if q not in tried:
+            tried[q] = jpeg_bytes(work, q)
+        return tried[q]
+
+    near_lo = max(min_quality, base_quality - 16)
+    for lo, hi in ((near_lo, base_quality - 1), (min_quality, near_lo - 1)):
+        best: Optional[int] = None
+        while lo <= hi:
+            q = (lo + hi) // 2
+            if len(encode(q)) <= target_bytes:
+                best, lo = q, q + 1
+            else:
+                hi = q - 1
+        if best is not None:
+            return tried[best]
+    return encode(min_quality)
+
+
 def compress_to_jpeg(raw: bytes, target_kb: int = 50, max_dim: int = 1600) -> tuple[bytes, str]:
     """
     将图片转成 JPEG，并尝试压到目标体积附近；即便不需压缩也统一输出 JPG。
-    返回 (bytes, mime)。
+    先以固定质量试编码一次，按“体积≈像素数×每像素字节”一次性估算缩放比例，
+    仍超标时再逐级降低质量。返回 (bytes, mime)。
     """
+    target_bytes = target_kb * 1024
+    min_dim = 320  # 避免缩得过小导致严重失真
+    base_quality = 78
+    min_quality = 10
+    buf = BytesIO()  # 所有试编码共用一个缓冲区
+
+    def jpeg_bytes(im, quality: int) -> bytes:
+        # getvalue() 在缓冲区恰好写满时直接共享内部 bytes，不比 getbuffer() 切片多拷贝
+        buf.seek(0)
+        buf.truncate()
+        im.save(buf, format="JPEG", quality=quality, subsampling=2, optimize=True, progressive=True)
+        return buf.getvalue()
+
     with BytesIO(raw) as bio:
         with Image.open(bio) as img:
-            img = img.convert("RGB")
-            w, h = img.size
-            scale = min(1.0, max_dim / max(w, h))
-            min_dim = 320  # 避免缩得过小导致严重失真
-            best_bytes: Optional[bytes] = None
-            best_size_kb: Optional[float] = None
-
-            def jpeg_bytes(im, quality: int) -> bytes:
-                buf = BytesIO()
-                im.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
-                return buf.getvalue()
-
-            while True:
+            # 已是体积达标、尺寸不超限的 RGB/灰度 JPEG：原样返回，省掉解码与重编码（Image.open 只读了文件头）
+            if (
+                len(raw) <= target_bytes
+                and raw[:3] == b"\xff\xd8\xff"
+                and img.mode in ("RGB", "L")
+                and max(img.size) <= max_dim
+            ):
+                return raw, "image/jpeg"
+            if img.size in _KNOWN_GENAI_SIZES:
+                base_quality = 82
+            # JPEG 输入直接按 1/2、1/4、1/8 的 DCT 缩放解码，省掉大部分全尺寸解码与缩放；其他格式无影响。
+            # draft 要求两边都不小于请求尺寸才会缩放，所以按原图宽高比给出目标尺寸，而不是正方形
+            if max(img.size) > max_dim:
+                s = max_dim / max(img.size)
+                img.draft("RGB", (math.ceil(img.width * s), math.ceil(img.height * s)))
+            # 先缩小再转 RGB，转换只作用于缩小后的像素；调色板/二值图只能最近邻缩放，先展开
+            if img.mode == "P":
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            elif img.mode == "1":
+                img = img.convert("L")
+            # reducing_gap：大倍数缩小时先做整数倍 box 预缩小，LANCZOS 只处理剩余倍数
+            img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            img = _to_rgb(img)
+            data = jpeg_bytes(img, base_quality)
+
+            if len(data) > target_bytes:
+                # 固定质量下 JPEG 体积与像素数近似成正比，边长按 sqrt(比例) 缩放；
+                # 目标留 2.5%（39/40）余量抵消文件头等固定开销，尽量一次落到目标以内，省掉降质量重编码。
+                # 全程整数运算（isqrt + 整除），同一输入在不同平台上得到相同尺寸
+                w, h = img.size
+                longest = max(w, h)
+                target_dim = math.isqrt(longest * longest * target_bytes * 39 // (len(data) * 40))
+                target_dim = max(min_dim, target_dim)
                 work = img
-                if scale < 1.0:
-                    work = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
-
-                lo, hi = 10, 95
-                local_best = None
-                local_size = None
-                while lo <= hi:
-                    q = (lo + hi) // 2
-                    data = jpeg_bytes(work, q)
-                    size_kb = len(data) / 1024
-                    if size_kb <= target_kb:
-                        local_best = data
-                        local_size = size_kb
-                        hi = q - 1
-                    else:
-                        lo = q + 1
-
-                if local_best:
-                    best_bytes, best_size_kb = local_best, local_size
-                    break
-
-                # 如果压到最低质量仍大于目标，则继续缩尺寸
-                scale *= 0.85
-                if max(work.size) <= min_dim or scale <= 0.2:
-                    # 兜底使用最低质量结果
-                    fallback = jpeg_bytes(work, 10)
-                    best_bytes, best_size_kb = fallback, len(fallback) / 1024
-                    break
-
-            if best_bytes and best_size_kb is not None:
-                if best_size_kb > target_kb:
-                    print(f"⚠️ 仅压到约 {best_size_kb:.1f}KB（目标 {target_kb}KB），已尽量保持清晰。", file=sys.stderr)
-                return best_bytes, "image/jpeg"
-    return raw, "image/jpeg"
+                if target_dim < longest:
+                    new_size = (max(1, w * target_dim // longest), max(1, h * target_dim // longest))
+                    work = img.resize(new_size, Image.Resampling.LANCZOS)
+                    data = jpeg_bytes(work, base_quality)
+
+                if len(data) > target_bytes:
+                    data = _search_quality(work, jpeg_bytes, base_quality, data, min_quality, target_bytes)
+
+            size_kb = len(data) / 1024
+            if size_kb > target_kb:
+                print(f"⚠️ 仅压到约 {size_kb:.1f}KB（目标 {target_kb}KB），已尽量保持清晰。", file=sys.stderr)
+            return data, "image/jpeg"
 
 HISTORY_PROMPT_TIP = '''
 请生成一张用于中学/高中历史知识点讲解或试卷题目的黑白配图。
@@ -151,19 +224,18 @@ SUBJECT_KEYWORDS = {
     "P": ("物理", "physics", "phys "),
 }
 
+# 所有关键词合并成一个正则，一次扫描标题即可
+_KW2CODE = {kw.lower(): code for code, kws in SUBJECT_KEYWORDS.items() for kw in kws}
+_KW_RE = re.compile("|".join(map(re.escape, _KW2CODE)), re.IGNORECASE)
+
+
 def guess_subject_from_title(title: str) -> Optional[str]:
     """
     根据 deck/quiz 的标题猜测学科，返回 'B'/'H'/'P'，无法判断则返回 None。
-    支持中英文关键词匹配（不区分大小写）。
+    支持中英文关键词匹配（不区分大小写），以标题中最先出现的关键词为准。
     """
-    if not title:
-        return None
-    text = title.lower()
-    for code, keywords in SUBJECT_KEYWORDS.items():
-        for kw in keywords:
-            if kw in title or kw.lower() in text:
-                return code
-    return None
+    m = _KW_RE.search(title or "")
+    return _KW2CODE[m.group(0).lower()] if m else None
 
 def build_prompt(img_desc: str, subject: str) -> str:
     if not img_desc:
@@ -180,39 +252,33 @@ def build_prompt(img_desc: str, subject: str) -> str:
     return f"{tip.strip()}\n\n图片内容如下：{img_desc}"
 
 
-def generate_image_bytes(
-    prompt: str,
-    subject: str,
-    target_kb: int = 50,
-    model_name: str = DEFAULT_MODEL,
-    aspect_ratio: str = "4:3",
-) -> tuple[bytes, str]:
-    """根据提示词生成图片并压缩到目标体积，返回 (字节流, mime_type)。"""
-    try:
-        from google import genai
-    except ImportError as e:
-        raise RuntimeError("未找到 google-genai，请先安装：pip install google-genai") from e
+def _new_client():
+    if not _GENAI_AVAILABLE:
+        raise RuntimeError("未找到 google-genai，请先安装：pip install google-genai")
+    return genai.Client(api_key=load_google_api_key())
 
-    api_key = load_google_api_key()
-    client = genai.Client(api_key=api_key)
-    prompt_bw = build_prompt(prompt, subject)
 
-    try:
-        resp = client.models.generate_content(
-            model=model_name,
-            contents=prompt_bw,
-            config=genai.types.GenerateContentConfig(
-                response_modalities=["image"],
-                image_config=genai.types.ImageConfig(
-                    aspect_ratio=aspect_ratio,
-                ),
-            ),
-        )
-    except Exception as e:
-        raise RuntimeError(f"调用生成接口失败: {e}") from e
+@lru_cache(maxsize=1)
+def _client():
+    """
+    同步调用共用的 genai.Client，进程内只创建一次，复用其 HTTP 连接。
+    异步批量（client.aio）的连接池绑定在事件循环上，不能跨 asyncio.run 复用，由 _generate_image_bytes_many 单独创建。
+    """
+    return _new_client()
 
+
+def _image_config(aspect_ratio: str):
+    return genai.types.GenerateContentConfig(
+        response_modalities=["image"],
+        image_config=genai.types.ImageConfig(
+            aspect_ratio=aspect_ratio,
+        ),
+    )
+
+
+def _extract_image_bytes(resp) -> bytes:
+    """从 generate_content 的响应中取出第一张图片的原始字节。"""
     raw_bytes: Optional[bytes] = None
-    mime_type: str = "image/png"
     parts: list = []
     if hasattr(resp, "candidates") and resp.candidates:
         for cand in resp.candidates:
@@ -229,8 +295,6 @@ def generate_image_bytes(
         inline = getattr(part, "inline_data", None)
         if inline and getattr(inline, "data", None):
             raw_bytes = inline.data
-            if getattr(inline, "mime_type", None):
-                mime_type = str(inline.mime_type)
             break
         data_field = getattr(part, "data", None)
         if isinstance(data_field, bytes):
@@ -245,11 +309,91 @@ def generate_image_bytes(
 
     if not raw_bytes:
         raise RuntimeError("无法从响应中提取图片数据（可能被安全过滤或响应为空）。")
+    return raw_bytes
+
+
+def generate_image_bytes(
+    prompt: str,
+    subject: str,
+    target_kb: int = 50,
+    model_name: str = DEFAULT_MODEL,
+    aspect_ratio: str = "4:3",
+) -> tuple[bytes, str]:
+    """根据提示词生成图片并压缩到目标体积，返回 (字节流, mime_type)。"""
+    client = _client()
+    prompt_bw = build_prompt(prompt, subject)
+
+    try:
+        resp = client.models.generate_content(
+            model=model_name,
+            contents=prompt_bw,
+            config=_image_config(aspect_ratio),
+        )
+    except Exception as e:
+        raise RuntimeError(f"调用生成接口失败: {e}") from e
 
+    raw_bytes = _extract_image_bytes(resp)
     compressed, mime_type = compress_to_jpeg(raw_bytes, target_kb=target_kb)
     return compressed, mime_type
 
 
+async def _generate_image_bytes_many(
+    prompts: List[str],
+    subject: str,
+    target_kb: int,
+    model_name: str,
+    aspect_ratio: str,
+    concurrency: int,
+) -> List[Union[tuple[bytes, str], BaseException]]:
+    # client.aio 的连接池绑定在事件循环上：每次 asyncio.run 用新的客户端，结束时关闭其异步连接
+    client = _new_client()
+    config = _image_config(aspect_ratio)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+
+    async def one(pool: ProcessPoolExecutor, prompt: str) -> tuple[bytes, str]:
+        prompt_bw = build_prompt(prompt, subject)
+        async with sem:
+            try:
+                resp = await client.aio.models.generate_content(
+                    model=model_name,
+                    contents=prompt_bw,
+                    config=config,
+                )
+            except Exception as e:
+                raise RuntimeError(f"调用生成接口失败: {e}") from e
+        raw_bytes = _extract_image_bytes(resp)
+        # 解码 + 压缩是 CPU 密集型，放到进程池里与其他请求重叠
+        return await loop.run_in_executor(pool, compress_to_jpeg, raw_bytes, target_kb)
+
+    try:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(prompts))) as pool:
+            return await asyncio.gather(*(one(pool, p) for p in prompts), return_exceptions=True)
+    finally:
+        aclose = getattr(client.aio, "aclose", None)  # 较旧的 google-genai 没有 aclose
+        if aclose is not None:
+            await aclose()
+
+
+def generate_image_bytes_many(
+    prompts: List[str],
+    subject: str,
+    target_kb: int = 50,
+    model_name: str = DEFAULT_MODEL,
+    aspect_ratio: str = "4:3",
+    concurrency: int = 5,
+) -> List[Union[tuple[bytes, str], BaseException]]:
+    """
+    批量生成图片：最多 concurrency 个请求并发，压缩在进程池中进行。
+    返回值与 prompts 一一对应，成功为 (字节流, mime_type)，失败为对应的异常对象。
+    """
+    if not prompts:
+        return []
+    return asyncio.run(
+        _generate_image_bytes_many(prompts, subject, target_kb, model_name, aspect_ratio, concurrency)
+    )
+
+
 def generate_image(prompt: str, subject: str, model_name: str, out_path: Path, mime_type: Optional[str]) -> None:
     try:
         raw_bytes, _mime = generate_image_bytes(prompt, subject=subject, target_kb=50, model_name=model_name)
@@ -14,7 +14,6 @@
 
 import argparse
 import base64
-import os
 import sys
 import traceback
 from io import BytesIO
@@ -24,19 +23,15 @@ from typing import Optional, Tuple
 from google import genai
 from google.genai import types
 
+from _env_util import get_env_value
+
 DEFAULT_MODEL = "imagen-4.0-generate-001"
 ENV_LOCAL_PATH = Path(__file__).resolve().parent / ".env.local"
 
 
 def load_google_api_key() -> str:
     """参考 gen_image.py 中的实现，支持环境变量与本地 .env.local。"""
-    key = os.getenv("GOOGLE_API_KEY") or os.getenv("GOOLE_API_KEY")
-    if not key and ENV_LOCAL_PATH.exists():
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            stripped = line.strip()
-            if stripped.startswith("GOOGLE_API_KEY=") or stripped.startswith("GOOLE_API_KEY="):
-                key = stripped.split("=", 1)[1].strip().strip('"').strip("'")
-                break
+    key = get_env_value(ENV_LOCAL_PATH, "GOOGLE_API_KEY", "GOOLE_API_KEY")
     if not key:
         print("❌ 请设置 GOOGLE_API_KEY 环境变量或在 .env.local 中提供。", file=sys.stderr)
         sys.exit(1)
@@ -8,14 +8,28 @@
 """
 
 import argparse
+import asyncio
+import hashlib
 import json
-import os
+import re
 import sys
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from quizit_storage import fetch_cards_by_quiz_title, upload_to_storage  # 同目录引用
+from quizit_storage import fetch_cards_by_quiz_title, get_sp_client, upload_to_storage  # 同目录引用
 from gen_image import generate_image_bytes  # 生成图片接口
+from supabase import Client
+
+from _fs_util import atomic_write_bytes
+
+ASPECT_RATIO = "4:3"
+# 描述为空或只是“图片”之类的占位词时，生成结果没有意义，直接跳过
+_MIN_DESC_LEN = 2
+_GENERIC_DESCS = {"image", "img", "picture", "photo", "图", "图片", "配图", "插图", "示意图"}
+
+
+# ![alt](url) 或 ![alt]；url 部分可选
+_MD_IMAGE_RE = re.compile(r"!\[([^\]]*)\](?:\(([^)]*)\))?")
 
 
 def extract_markdown_images(text: str) -> List[Tuple[Optional[str], Optional[str]]]:
@@ -24,31 +38,10 @@ def extract_markdown_images(text: str) -> List[Tuple[Optional[str], Optional[str
     - ![alt](url) → (alt, url)
     - ![alt]      → (alt, None)
     """
-    results: List[Tuple[Optional[str], Optional[str]]] = []
-    i = 0
-    while i < len(text):
-        bang = text.find("![", i)
-        if bang == -1:
-            break
-        close_bracket = text.find("]", bang + 2)
-        if close_bracket == -1:
-            break
-
-        alt_text = text[bang + 2 : close_bracket].strip()
-        url: Optional[str] = None
-
-        if close_bracket + 1 < len(text) and text[close_bracket + 1] == "(":
-            close_paren = text.find(")", close_bracket + 2)
-            if close_paren != -1:
-                url = text[close_bracket + 2 : close_paren].strip()
-                i = close_paren + 1
-            else:
-                i = close_bracket + 2
-        else:
-            i = close_bracket + 1
-
-        results.append((alt_text or None, url or None))
-    return results
+    return [
+        (m.group(1).strip() or None, (m.group(2) or "").strip() or None)
+        for m in _MD_IMAGE_RE.finditer(text)
+    ]
 
 
 def extract_front(front_raw: str) -> Tuple[str, List[Tuple[Optional[str], Optional[str]]]]:
@@ -71,14 +64,7 @@ def extract_front(front_raw: str) -> Tuple[str, List[Tuple[Optional[str], Option
     image_infos = extract_markdown_images(prompt_text) if prompt_text else []
 
     # 去重保持顺序
-    seen = set()
-    deduped: List[Tuple[Optional[str], Optional[str]]] = []
-    for info in image_infos:
-        key = (info[0] or "", info[1] or "")
-        if key not in seen:
-            seen.add(key)
-            deduped.append(info)
-    return prompt_text, deduped
+    return prompt_text, list(dict.fromkeys(image_infos))
 
 
 def main(argv: Optional[List[str]] = None) -> None:
@@ -95,6 +81,12 @@ def main(argv: Optional[List[str]] = None) -> None:
         choices=["B", "H", "P"],
         help="学科：P(物理)/H(历史)/B(生物)；开启 --doit 时必填",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=5,
+        help="同时调用生成接口的最大数量，默认 5",
+    )
     args = parser.parse_args(argv)
 
     if args.doit and not args.subject:
@@ -107,43 +99,99 @@ def main(argv: Optional[List[str]] = None) -> None:
         sys.exit(1)
 
     print(f"📃 模板 {args.title} 题目图片列表：")
-    found_any = False
+    cache_dir = Path("tmp/quiz_images_cache")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    jobs: List[Tuple[str, int, str]] = []
     for card in cards:  # 已按模板顺序返回
         cid = card.get("id")
         prompt_text, infos = extract_front(card.get("front") or "")
         if infos:
-            found_any = True
-            print(f"- card {cid}:")
+            print(f"- card {cid}: {len(infos)} 张图片")
             for idx, (alt, url) in enumerate(infos, start=1):
-                desc = alt or prompt_text or "image"
-                filename = f"front{idx}.jpg"
-                cache_dir = Path("tmp/quiz_images_cache")
-                cache_dir.mkdir(parents=True, exist_ok=True)
-                local_path = cache_dir / f"{cid}-{filename}"
-
-                img_bytes: Optional[bytes] = None
-                mime = "image/jpeg"
-
-                if local_path.exists():
-                    img_bytes = local_path.read_bytes()
-                    print(f"    cache found: {local_path}")
-                elif args.doit:
-                    try:
-                        img_bytes, mime = generate_image_bytes(desc, subject=args.subject)
-                        local_path.write_bytes(img_bytes)
-                        print(f"    image generated & cached: {local_path}")
-                    except RuntimeError as e:
-                        print(f"⚠️ 生成图片失败（card {cid}, #{idx}, prompt='{desc}'): {e}", file=sys.stderr)
-                        continue
-                else:
-                    print(f"    skip (no cache, --doit 未开启)")
+                # 归一化空白，相同描述得到相同缓存键，同一次运行中只生成一次
+                desc = " ".join((alt or prompt_text or "").split())
+                if len(desc) < _MIN_DESC_LEN or desc.lower() in _GENERIC_DESCS:
+                    print(f"    [{cid} #{idx}] skip (描述过短或过于笼统: {desc!r})")
                     continue
-
-                upload_to_storage(cid, img_bytes, filename, content_type=mime)
-                print(f"    done {cid}")
-    if not found_any:
+                jobs.append((cid, idx, desc))
+    if not jobs:
         print("ℹ️ 未找到任何图片 URL。")
+        return
+
+    asyncio.run(process_images(jobs, cache_dir, args))
+
+
+def image_cache_key(desc: str, subject: str, aspect_ratio: str = ASPECT_RATIO) -> str:
+    """生成图片的缓存键：由描述、学科与宽高比决定。"""
+    return hashlib.sha256(f"{subject}|{aspect_ratio}|{desc}".encode("utf-8")).hexdigest()[:16]
+
+
+async def process_image(
+    cid: str,
+    idx: int,
+    desc: str,
+    cache_dir: Path,
+    args: argparse.Namespace,
+    sem: asyncio.Semaphore,
+    sp_client: Client,
+    key_locks: Dict[str, asyncio.Lock],
+) -> None:
+    """处理单张图片：优先用本地缓存，否则（--doit 时）生成；最后上传。阻塞调用都放到线程里。"""
+    filename = f"front{idx}.jpg"
+    local_path = cache_dir / f"{cid}-{filename}"
+    tag = f"[{cid} #{idx}]"
+
+    img_bytes: Optional[bytes] = None
+    mime = "image/jpeg"
+
+    # 按提示词内容寻址的缓存：不同卡片/题目中的相同描述只生成一次（需要 subject 才能确定提示词）
+    hash_path: Optional[Path] = None
+    if args.subject:
+        key = image_cache_key(desc, args.subject)
+        hash_path = cache_dir / "by_hash" / f"{key}.jpg"
+        lock = key_locks.setdefault(key, asyncio.Lock())
+    else:
+        lock = asyncio.Lock()
+
+    async with lock:  # 同一 key 的并发任务等待首个生成完成后直接读缓存
+        if hash_path is not None and hash_path.exists():
+            img_bytes = await asyncio.to_thread(hash_path.read_bytes)
+            if not local_path.exists():
+                await asyncio.to_thread(atomic_write_bytes, local_path, img_bytes)
+            print(f"    {tag} cache found: {hash_path}")
+        elif local_path.exists():
+            img_bytes = await asyncio.to_thread(local_path.read_bytes)
+            print(f"    {tag} cache found: {local_path}")
+        elif args.doit:
+            try:
+                async with sem:
+                    img_bytes, mime = await asyncio.to_thread(
+                        generate_image_bytes, desc, subject=args.subject, aspect_ratio=ASPECT_RATIO
+                    )
+            except RuntimeError as e:
+                print(f"⚠️ 生成图片失败（card {cid}, #{idx}, prompt='{desc}'): {e}", file=sys.stderr)
+                return
+            if hash_path is not None:
+                await asyncio.to_thread(atomic_write_bytes, hash_path, img_bytes)
+            await asyncio.to_thread(atomic_write_bytes, local_path, img_bytes)
+            print(f"    {tag} image generated & cached: {local_path}")
+        else:
+            print(f"    {tag} skip (no cache, --doit 未开启)")
+            return
 
+    await asyncio.to_thread(upload_to_storage, cid, img_bytes, filename, content_type=mime, client=sp_client)
+    print(f"    {tag} done")
+
+
+async def process_images(jobs: List[Tuple[str, int, str]], cache_dir: Path, args: argparse.Namespace) -> None:
+    # 生成接口每次 5-30s，限制同时进行的请求数以免触发限流
+    sem = asyncio.Semaphore(max(1, args.concurrency))
+    sp_client = get_sp_client()  # 所有上传共用一个客户端
+    # 每次运行新建：asyncio.Lock 绑定在当前事件循环上，不能跨 asyncio.run 复用
+    key_locks: Dict[str, asyncio.Lock] = {}
+    await asyncio.gather(
+        *(process_image(cid, idx, desc, cache_dir, args, sem, sp_client, key_locks) for cid, idx, desc in jobs)
+    )
 
 if __name__ == "__main__":
     main()
@@ -30,21 +30,18 @@ Vector Store CLI 工具
 import os
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from pathlib import Path
 
 from openai import OpenAI, APIError
 
+from _env_util import get_env_value
+
 ENV_LOCAL_PATH = Path(__file__).resolve().parent / ".env.local"
 
 def get_client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key and ENV_LOCAL_PATH.exists():
-        # 简单读取 .env.local 中的 OPENAI_API_KEY=... 行
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            if line.strip().startswith("OPENAI_API_KEY="):
-                api_key = line.split("=", 1)[1].strip().strip('"').strip("'")
-                break
+    api_key = get_env_value(ENV_LOCAL_PATH, "OPENAI_API_KEY")
 
     if not api_key:
         print("❌ 请先设置环境变量 OPENAI_API_KEY", file=sys.stderr)
@@ -103,16 +100,17 @@ def cmd_list_files(args: argparse.Namespace) -> None:
         return
 
     print(f"vector store {args.store_id} 中共有 {len(files.data)} 个文件：\n")
-    for f in files.data:
+    # 元信息逐个 retrieve 是独立的网络请求，并发取回后按原顺序输出
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futures = [pool.submit(client.files.retrieve, f.id) for f in files.data]
+    for f, fut in zip(files.data, futures):
         filename = ""
         byte_size = "N/A"
         try:
-            meta = client.files.retrieve(f.id)
+            meta = fut.result()
             filename = getattr(meta, "filename", "") or ""
             byte_size = getattr(meta, "bytes", "N/A")
         except APIError as e:
-            filename = ""
-            byte_size = "N/A"
             print(f"  ⚠️ 获取文件元信息失败 {f.id}: {e}", file=sys.stderr)
 
         print(f"- file_id : {f.id}")
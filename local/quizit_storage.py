@@ -3,31 +3,35 @@
 封装 Supabase 相关工具：环境加载、客户端创建、存储上传。
 """
 
-import os
+import hashlib
+import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Iterator, Optional, List, Tuple
 
 from supabase import Client, create_client  # pip install supabase
 
+import _env_util
+from _fs_util import atomic_write_text
+
 ENV_LOCAL_PATH = Path(__file__).resolve().parent / ".env.local"
 SUPABASE_BUCKET = "quizit_card_medias"
 
 
 def load_env() -> Dict[str, str]:
-    """读取环境变量，合并 .env.local（不覆盖已存在的环境变量）。"""
-    env = dict(os.environ)
-    if ENV_LOCAL_PATH.exists():
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            if "=" not in line or line.strip().startswith("#"):
-                continue
-            k, v = line.split("=", 1)
-            env.setdefault(k.strip(), v.strip().strip('"').strip("'"))
-    return env
+    """读取环境变量，合并 .env.local（不覆盖已存在的环境变量）；.env.local 的解析结果在进程内缓存。"""
+    return _env_util.load_env(ENV_LOCAL_PATH)
 
 
+@lru_cache(maxsize=1)
 def get_sp_client() -> Client:
-    """创建 Supabase 客户端，需 VITE_SUPABASE_URL/VITE_SUPABASE_ANON_KEY。"""
+    """
+    创建 Supabase 客户端，需 VITE_SUPABASE_URL/VITE_SUPABASE_ANON_KEY。
+    进程内只创建一次，多次上传复用同一个 HTTP 会话；客户端可在多线程间共享。
+    """
     env = load_env()
     url = env.get("VITE_SUPABASE_URL")
     key = env.get("VITE_SUPABASE_ANON_KEY")
@@ -42,10 +46,12 @@ def upload_to_storage(
     content: bytes,
     filename: str,
     content_type: Optional[str] = None,
+    client: Optional[Client] = None,
 ) -> Optional[str]:
+    """上传单个文件到 storage；client 未传入时使用进程内缓存的客户端。"""
     path = f"{card_id}/{filename}"
     try:
-        client = get_sp_client()
+        client = client or get_sp_client()
         ct = content_type
         if not ct:
             ext = Path(filename).suffix.lstrip(".")
@@ -69,13 +75,141 @@ def upload_to_storage(
         return None
 
 
+def load_upload_manifest(path: Path) -> Dict[str, str]:
+    """读取上传清单：storage 路径（card_id/filename）→ 内容 sha256。"""
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_upload_manifest(path: Path, manifest: Dict[str, str]) -> None:
+    atomic_write_text(path, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+def upload_to_storage_many(
+    items: List[Tuple[str, bytes, str]],
+    max_workers: int = 16,
+) -> List[Optional[str]]:
+    """
+    并发上传多个文件，items 为 (card_id, content, filename)。
+    返回值与 items 一一对应（成功为 storage 路径，失败为 None）。
+    """
+    if not items:
+        return []
+    client = get_sp_client()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(lambda item: upload_to_storage(*item, client=client), items))
+
+
+def upload_many_if_changed(
+    manifest: Dict[str, str],
+    items: List[Tuple[str, bytes, str]],
+) -> List[Optional[str]]:
+    """
+    同 upload_to_storage_many，但内容哈希与 manifest 记录一致的文件直接跳过（视为成功），
+    上传成功的文件更新 manifest。
+    """
+    results: List[Optional[str]] = [None] * len(items)
+    digests = [hashlib.sha256(content).hexdigest() for _, content, _ in items]
+    todo: List[int] = []
+    for i, (card_id, _, filename) in enumerate(items):
+        path = f"{card_id}/{filename}"
+        if manifest.get(path) == digests[i]:
+            results[i] = path
+        else:
+            todo.append(i)
+    uploaded = upload_to_storage_many([items[i] for i in todo])
+    for i, res in zip(todo, uploaded):
+        results[i] = res
+        if res:
+            card_id, _, filename = items[i]
+            manifest[f"{card_id}/{filename}"] = digests[i]
+    return results
+
+
+class DeckUploadQueue:
+    """
+    deck 批量脚本共用的本地缓存与待上传队列。
+    cache_dir 下每张卡片一个 {card_id}{suffix} 文件，.uploaded.json 记录已上传内容的哈希；
+    生成结果先排队，全部处理完后由 flush 统一并发上传（内容未变的跳过）并保存清单。
+    """
+
+    def __init__(self, cache_dir: Path, suffix: str):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = cache_dir / ".uploaded.json"
+        self.manifest = load_upload_manifest(self.manifest_path)
+        # 一次列目录代替逐张 stat
+        self.existing = {p.stem for p in cache_dir.glob(f"*{suffix}")}
+        # 保护 existing 与 items：工作线程也可能写缓存、排队上传
+        self.state_lock = threading.Lock()
+        # 待上传文件 (card_id, content, filename)
+        self.items: List[Tuple[str, bytes, str]] = []
+
+    def local_path(self, card_id: str) -> Path:
+        return self.cache_dir / f"{card_id}{self.suffix}"
+
+    def has_local(self, card_id: str) -> bool:
+        return card_id in self.existing
+
+    def save_local(self, card_id: str, text: str) -> None:
+        """写入本地缓存文件；已存在的不覆盖。"""
+        with self.state_lock:
+            if card_id not in self.existing:
+                atomic_write_text(self.local_path(card_id), text)
+                self.existing.add(card_id)
+
+    def enqueue(self, card_id: str, content: bytes, filename: str) -> None:
+        with self.state_lock:
+            self.items.append((card_id, content, filename))
+
+    def flush(self) -> List[Optional[str]]:
+        """上传所有排队的文件并保存清单，返回值与 items 一一对应。"""
+        results = upload_many_if_changed(self.manifest, self.items)
+        save_upload_manifest(self.manifest_path, self.manifest)
+        return results
+
+
+_IN_CHUNK_SIZE = 500  # 单次 .in_() 的 id 数上限，避免 URL 过长被 PostgREST 拒绝
+
+
 def _fetch_deck_cards(card_ids: List[str]) -> list[dict]:
-    """批量读取 cards（id, front, back）。"""
+    """批量读取 cards（id, front, back）；id 较多时分块并发查询，各块结果按分块顺序拼接。"""
     if not card_ids:
         return []
     client = get_sp_client()
-    res = client.table("cards").select("id, front, back").in_("id", card_ids).execute()
-    return res.data or []
+
+    def fetch_chunk(ids: List[str]) -> list[dict]:
+        res = client.table("cards").select("id, front, back").in_("id", ids).execute()
+        return res.data or []
+
+    if len(card_ids) <= _IN_CHUNK_SIZE:
+        return fetch_chunk(card_ids)
+    chunks = [card_ids[i:i + _IN_CHUNK_SIZE] for i in range(0, len(card_ids), _IN_CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as executor:
+        return [card for rows in executor.map(fetch_chunk, chunks) for card in rows]
+
+
+def _ordered_card_ids(items_obj: Optional[dict]) -> List[str]:
+    """从 deck/quiz 的 items 字段中按 position 取出 card_id 列表（缺 position 视为 0）。"""
+    items = (items_obj or {}).get("items") or []
+    return [
+        it["card_id"]
+        for it in sorted(items, key=lambda it: it.get("position", 0))
+        if it.get("card_id")
+    ]
+
+
+def _order_cards_by_items(items_obj: Optional[dict]) -> list[dict]:
+    """拉取 items 中引用的 cards，并按 items 顺序返回；已被删除的卡片跳过。"""
+    card_ids = _ordered_card_ids(items_obj)
+    card_map = {c["id"]: c for c in _fetch_deck_cards(card_ids)}
+    return [card_map[cid] for cid in card_ids if cid in card_map]
 
 
 def find_deck_by_title(title: str) -> Optional[dict]:
@@ -102,12 +236,24 @@ def fetch_cards_by_deck_title(title: str) -> list[dict]:
     deck = find_deck_by_title(title)
     if not deck:
         return []
-    items = (deck.get("items") or {}).get("items") or []
-    ordered = sorted(items, key=lambda it: it.get("position", 0))
-    card_ids = [it.get("card_id") for it in ordered if it.get("card_id")]
-    cards = _fetch_deck_cards(card_ids)
-    card_map = {c["id"]: c for c in cards}
-    return [card_map[cid] for cid in card_ids if cid in card_map]
+    return _order_cards_by_items(deck.get("items"))
+
+
+def iter_cards_by_deck_title(title: str, page_size: int = 500) -> Iterator[dict]:
+    """
+    同 fetch_cards_by_deck_title，但按 page_size 分页拉取 cards 并逐条产出，
+    调用方可以在后续页面返回前就开始处理前面的卡片。
+    """
+    deck = find_deck_by_title(title)
+    if not deck:
+        return
+    card_ids = _ordered_card_ids(deck.get("items"))
+    for start in range(0, len(card_ids), page_size):
+        page_ids = card_ids[start:start + page_size]
+        card_map = {c["id"]: c for c in _fetch_deck_cards(page_ids)}
+        for cid in page_ids:
+            if cid in card_map:
+                yield card_map[cid]
 
 
 def fetch_cards_by_quiz_title(title: str) -> list[dict]:
@@ -117,22 +263,23 @@ def fetch_cards_by_quiz_title(title: str) -> list[dict]:
     quiz = find_quiz_by_name(title)
     if not quiz:
         return []
-    items = (quiz.get("items") or {}).get("items") or []
-    ordered = sorted(items, key=lambda it: it.get("position", 0))
-    card_ids = [it.get("card_id") for it in ordered if it.get("card_id")]
-    cards = _fetch_deck_cards(card_ids)
-    card_map = {c["id"]: c for c in cards}
-    return [card_map[cid] for cid in card_ids if cid in card_map]
+    return _order_cards_by_items(quiz.get("items"))
 
 
 __all__ = [
     "load_env",
     "get_sp_client",
     "upload_to_storage",
+    "upload_to_storage_many",
+    "upload_many_if_changed",
+    "load_upload_manifest",
+    "save_upload_manifest",
+    "DeckUploadQueue",
     "SUPABASE_BUCKET",
     "fetch_deck_cards",
     "find_deck_by_title",
     "find_quiz_by_name",
     "fetch_cards_by_deck_title",
+    "iter_cards_by_deck_title",
     "fetch_cards_by_quiz_title",
 ]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+OpenAI 文本响应的本地缓存：进程内 LRU + 磁盘文件。
+
+键为 sha256(model|store_id|prompt)，磁盘路径为 tmp/resp_cache/<key 前两位>/<key>.txt。
+相同输入重复运行时直接返回已有结果，不再请求接口。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from _fs_util import atomic_write_text
+
+CACHE_DIR = Path("tmp/resp_cache")
+MAX_MEMORY_ITEMS = 2000
+
+_memory: "OrderedDict[str, str]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def make_key(*parts: str) -> str:
+    """按 "|" 拼接各部分（如 model、store_id、prompt）后取 sha256。"""
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.txt"
+
+
+def _remember(key: str, value: str) -> None:
+    with _lock:
+        _memory[key] = value
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_MEMORY_ITEMS:
+            _memory.popitem(last=False)
+
+
+def get(key: str) -> Optional[str]:
+    with _lock:
+        value = _memory.get(key)
+        if value is not None:
+            _memory.move_to_end(key)
+            return value
+    path = _cache_path(key)
+    if not path.exists():
+        return None
+    value = path.read_text(encoding="utf-8")
+    _remember(key, value)
+    return value
+
+
+def put(key: str, value: str) -> None:
+    atomic_write_text(_cache_path(key), value)
+    _remember(key, value)
+
+
+__all__ = ["CACHE_DIR", "make_key", "get", "put"]
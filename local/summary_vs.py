@@ -4,114 +4,592 @@
 
 示例：
   python summary_vs.py --store-id vs_xxx --prompt "请用中文总结关键要点"
+  python summary_vs.py --store-id vs_xxx --keyword 第一章 第二章 第三章   # 多个关键词并发请求
 """
 
 import argparse
-import os
+import asyncio
 import sys
 import json
+import textwrap
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, List, Literal, Optional, Tuple, Union
 
-from openai import OpenAI, APIError
+from _env_util import get_env_value
+from _fs_util import atomic_write_text
+from _resp_util import extract_text
+from resp_cache import make_key
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+try:
+    import orjson  # pip install orjson，可选；未安装时退回标准库 json
+except ImportError:
+    orjson = None
 
 ENV_LOCAL_PATH = Path(__file__).resolve().parent.parent / ".env.local"
+BATCH_POLL_SECONDS = 30
+COMPACT_OVER_BYTES = 1 << 20
+MAX_RETRIES = 5
+DEFAULT_CACHE_DIR = Path("~/.cache/quizit/summary_vs").expanduser()
+
+
+# 知识点抽取要求；每次调用都相同，作为 instructions 固定前缀发送，章节内容（关键词）单独作为 input，
+# 便于服务端 prompt cache 命中
+_PROMPT_INSTRUCTIONS = textwrap.dedent(
+    """\
+    请从我提供的教材章节内容中，自动抽取该章节的“核心知识点列表”。要求如下：
+
+    1. 输出一个 JSON 对象，其 "knowledge_points" 字段为知识点数组，每个元素包含：
+       - "name": 知识点名称
+       - "type": 类型（必须是以下三类之一：“事件”“人物与组织”“历史因素”）
+
+    2. 只抽取真正构成知识体系的核心知识点，必须符合以下标准：
+       【事件】—— 发生在明确时间地点、有明确过程的历史事件；例如战争、条约签订、改革、运动、政变。
+       【人物与组织】—— 本章出现的明确历史人物或成规模、具有历史作用的组织、集团、派别。
+       【历史因素】—— 具有清晰概念、贯穿性或推动性影响的思想、政策、制度或历史现象，例如“洋务运动”“列强瓜分中国狂潮”“清末新政”“门户开放政策”。
+
+    3. 不要列入以下内容：
+       - 章节中贯穿出现但不是独立“知识点”的描述性句子，如“民族危机加剧”“半殖民地化加深”“自强求富目标”等。
+       - 章节总结性的评价性结论，例如“中国开始沦为半殖民地半封建社会”“统治危机加剧”。
+       - 具体人物的行为细节、课后活动问题、材料阅读、插图说明。
+       - 模糊或过宽泛的抽象概念，除非教材明确以专有名词形式出现。
+
+    4. 确保知识点名称必须与教材中的标准表述一致，不得创造新概念。
+
+    5. 不要输出解释、说明、推理过程，只输出最终的 JSON。
+
+    下面是章节内容，请抽取知识点列表：
+    """
+)
 
-def summarize_knowledge_prompt(keyword: str) -> str:
-    assert str
-    return f'''
-        请从我提供的教材章节内容中，自动抽取该章节的“核心知识点列表”。要求如下：
 
-        1. 输出格式必须是一个 JSON 数组，每个元素包含：
-           - "name": 知识点名称
-           - "type": 类型（必须是以下三类之一：“事件”“人物与组织”“历史因素”）
+KNOWLEDGE_POINT_TYPES = ("事件", "人物与组织", "历史因素")
 
-        2. 只抽取真正构成知识体系的核心知识点，必须符合以下标准：
-           【事件】—— 发生在明确时间地点、有明确过程的历史事件；例如战争、条约签订、改革、运动、政变。
-           【人物与组织】—— 本章出现的明确历史人物或成规模、具有历史作用的组织、集团、派别。
-           【历史因素】—— 具有清晰概念、贯穿性或推动性影响的思想、政策、制度或历史现象，例如“洋务运动”“列强瓜分中国狂潮”“清末新政”“门户开放政策”。
 
-        3. 不要列入以下内容：
-           - 章节中贯穿出现但不是独立“知识点”的描述性句子，如“民族危机加剧”“半殖民地化加深”“自强求富目标”等。
-           - 章节总结性的评价性结论，例如“中国开始沦为半殖民地半封建社会”“统治危机加剧”。
-           - 具体人物的行为细节、课后活动问题、材料阅读、插图说明。
-           - 模糊或过宽泛的抽象概念，除非教材明确以专有名词形式出现。
+@lru_cache(maxsize=1)
+def _summary_models():
+    """
+    返回 (KnowledgePoint, KnowledgePointList, 结果校验器)。
+    pydantic 导入与建模在模块导入时就要约 100ms，推迟到第一次校验时，--help、参数错误不用付这部分开销。
+    """
+    from pydantic import BaseModel, TypeAdapter  # openai SDK 自带 pydantic v2
 
-        4. 确保知识点名称必须与教材中的标准表述一致，不得创造新概念。
+    class KnowledgePoint(BaseModel):
+        """模型输出的单个知识点，与提示词中要求的字段一致。"""
 
-        5. 不要输出解释、说明、推理过程，只输出最终的 JSON 数组。
+        name: str
+        type: Literal[KNOWLEDGE_POINT_TYPES]
 
-        下面是章节内容，请抽取知识点列表：
-        {keyword}
-   '''
+    class KnowledgePointList(BaseModel):
+        knowledge_points: List[KnowledgePoint]
 
+    # 旧缓存、未走结构化输出的结果是裸数组，两种形式都接受
+    adapter = TypeAdapter(Union[KnowledgePointList, List[KnowledgePoint]])
+    return KnowledgePoint, KnowledgePointList, adapter
 
+
+# 结构化输出（strict）要求根节点为对象，所以数组包在 knowledge_points 字段里；须与上面的模型保持一致
+_KNOWLEDGE_POINTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "knowledge_points": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "type": {"type": "string", "enum": list(KNOWLEDGE_POINT_TYPES)},
+                },
+                "required": ["name", "type"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["knowledge_points"],
+    "additionalProperties": False,
+}
+
+
+def _dump_json(obj, indent: bool) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _print_json(obj) -> None:
+    """
+    以缩进 2 格、保留中文的 UTF-8 JSON 直接写入 stdout 字节流，不经过文本层重新编码，整段一次写入。
+    缩进后超过 COMPACT_OVER_BYTES 时改为紧凑输出（需要阅读时可接 `| jq .`）。
+    """
+    data = _dump_json(obj, indent=True)
+    if len(data) > COMPACT_OVER_BYTES:
+        data = _dump_json(obj, indent=False)
+        print(f"ℹ️ 输出较大（>{COMPACT_OVER_BYTES // (1 << 20)}MB），已改为紧凑 JSON", file=sys.stderr)
+    sys.stdout.flush()  # 先清空文本层缓冲，保证与之前 print 的内容顺序一致
+    out = sys.stdout.buffer
+    out.write(data)
+    out.write(b"\n")
+    out.flush()
+
+
+def _json_loads(text: str):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+@lru_cache(maxsize=1)
 def load_api_key() -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key and ENV_LOCAL_PATH.exists():
-        for line in ENV_LOCAL_PATH.read_text().splitlines():
-            if line.strip().startswith("OPENAI_API_KEY="):
-                api_key = line.split("=", 1)[1].strip().strip('"').strip("'")
-                break
+    # 环境变量里已有时不再去读 .env.local
+    api_key = get_env_value(ENV_LOCAL_PATH, "OPENAI_API_KEY")
     if not api_key:
         print("❌ 请设置 OPENAI_API_KEY 环境变量或在 .env.local 中提供。", file=sys.stderr)
         sys.exit(1)
     return api_key
 
 
-def summarize(store_id: str, keyword: str, model: str, max_tokens: int) -> None:
-    client = OpenAI(api_key=load_api_key())
+@lru_cache(maxsize=1)
+def _get_client() -> "AsyncOpenAI":
+    """
+    进程内共享的异步客户端，所有请求复用同一连接池（keep-alive 连接）。
+    异步连接绑定在事件循环上，由 _run 在每次 asyncio.run 结束时关闭并清掉缓存。
+    """
+    # openai SDK（连带 httpx/anyio）导入较慢，推迟到真正需要请求时，--help、参数错误、全部命中缓存时都不用加载
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=32),
+    )
+    # SDK 自带重试：429、5xx、超时与连接错误按指数退避加随机抖动重试（遵循 retry-after），
+    # 400/401 等不可重试的错误立即抛出；重试发生在流开始之前，不会重复回显已输出的文本
+    return AsyncOpenAI(api_key=load_api_key(), http_client=http_client, max_retries=MAX_RETRIES)
+
+
+def _echo_delta(delta: str) -> None:
+    sys.stderr.write(delta)
+    sys.stderr.flush()
+
+
+class _ItemScanner:
+    """
+    从逐段到达的 JSON 文本中，取出第一个数组里已经完整的元素对象并回调 on_item。
+    只保留尚未取出的尾部文本，已取出的部分不会重复解析；只在新片段含 "}" 时尝试解析。
+    """
+
+    def __init__(self, on_item: Callable[[object], None]):
+        self._on_item = on_item
+        self._decoder = json.JSONDecoder()
+        self._tail = ""
+        self._in_array = False
+        self.count = 0
+
+    def feed(self, delta: str) -> None:
+        self._tail += delta
+        if not self._in_array:
+            # 跳过数组之前的内容（如外层 {"knowledge_points": ），否则外层对象会被当成一个元素
+            bracket = self._tail.find("[")
+            if bracket == -1:
+                return
+            self._tail = self._tail[bracket + 1:]
+            self._in_array = True
+        elif "}" not in delta:
+            return
+        while True:
+            start = self._tail.find("{")
+            if start == -1:
+                self._tail = ""
+                return
+            try:
+                obj, end = self._decoder.raw_decode(self._tail, start)
+            except json.JSONDecodeError:
+                return  # 对象尚未完整，等后续片段
+            self._tail = self._tail[end:]
+            self.count += 1
+            self._on_item(obj)
+
+    def feed_and_echo(self, delta: str) -> None:
+        _echo_delta(delta)
+        self.feed(delta)
+
+
+def _emit_item(item) -> None:
+    """JSON Lines：每个知识点一行，立即刷新，便于下游边读边处理。"""
+    sys.stdout.buffer.write(_dump_json(item, indent=False) + b"\n")
+    sys.stdout.buffer.flush()
+
+
+def _emit_point(obj) -> None:
+    """流式阶段取出的对象先按 KnowledgePoint 校验，不合格的不输出（由最终结果的校验报告错误）。"""
+    from pydantic import ValidationError
+
+    try:
+        point = _summary_models()[0].model_validate(obj)
+    except ValidationError:
+        return
+    _emit_item(point.model_dump())
+
+
+def _looks_like_json(keyword: str) -> bool:
+    if keyword.lstrip()[:1] not in ("[", "{"):
+        return False
+    try:
+        _json_loads(keyword)
+    except Exception:
+        return False
+    return True
+
+
+class BatchItemError(Exception):
+    """Batch API 中单个请求失败（或结果缺失），消息为服务端返回的错误内容。"""
+
+
+def _is_api_error(exc: BaseException) -> bool:
+    # openai 只在确有异常时才导入
+    if isinstance(exc, BatchItemError):
+        return True
+    from openai import APIError
+
+    return isinstance(exc, APIError)
+
+
+def _run(coro):
+    """在新的事件循环中执行 coro，结束后关闭共享客户端。"""
+
+    async def runner():
+        try:
+            return await coro
+        finally:
+            if _get_client.cache_info().currsize:
+                await _get_client().close()
+                _get_client.cache_clear()
+
+    return asyncio.run(runner())
+
+
+def _request_body(store_id: str, keyword: str, model: str, max_tokens: int) -> dict:
+    """responses.create 的参数；同步请求与 Batch API 共用。"""
+    return {
+        "model": model,
+        "instructions": _PROMPT_INSTRUCTIONS,
+        "input": keyword,
+        "prompt_cache_key": "summary_vs",
+        "max_output_tokens": max_tokens,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "knowledge_points",
+                "schema": _KNOWLEDGE_POINTS_SCHEMA,
+                "strict": True,
+            },
+        },
+        "tools": [{"type": "file_search", "vector_store_ids": [store_id]}],
+    }
+
+
+async def _fetch_summary(
+    client: "AsyncOpenAI",
+    store_id: str,
+    keyword: str,
+    model: str,
+    max_tokens: int,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> Tuple[Optional[str], object]:
+    """
+    流式请求单个关键词的知识点列表，每收到一段文本就回调 on_delta；
+    返回 (完整文本, 最终响应)，接口错误直接抛出。
+    """
+    chunks: List[str] = []
+    async with client.responses.stream(**_request_body(store_id, keyword, model, max_tokens)) as stream:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                chunks.append(event.delta)
+                if on_delta:
+                    on_delta(event.delta)
+        resp = await stream.get_final_response()
+
+    return "".join(chunks) or extract_text(resp), resp
+
+
+def _is_valid_summary(text: str) -> bool:
+    """文本能否通过知识点列表校验；被截断或拒答的回复不写入缓存，下次重新请求。"""
+    from pydantic import ValidationError
+
     try:
-        resp = client.responses.create(
-            model=model,
-            input=f"{summarize_knowledge_prompt(keyword)}",
-            max_output_tokens=max_tokens,
-            tools=[{"type": "file_search", "vector_store_ids": [store_id]}],
+        _summary_models()[2].validate_json(text)
+    except ValidationError:
+        return False
+    return True
+
+
+def _validated_points(text: str) -> Optional[List[dict]]:
+    """解析并校验知识点列表，不符合结构时在 stderr 提示并返回 None。"""
+    from pydantic import ValidationError
+
+    _, knowledge_point_list, adapter = _summary_models()
+    # 解析与结构校验一次完成（pydantic-core 直接解析 JSON 文本）
+    try:
+        result = adapter.validate_json(text)
+    except ValidationError as e:
+        # 结构化输出下只有被截断（max_output_tokens）或拒答时才会走到这里
+        print(f"⚠️ 输出不符合知识点列表结构: {e.error_count()} 处错误", file=sys.stderr)
+        return None
+    points = result.knowledge_points if isinstance(result, knowledge_point_list) else result
+    return [kp.model_dump() for kp in points]
+
+
+def _parse_summary(text: str):
+    points = _validated_points(text)
+    if points is not None:
+        return points
+    # 尝试按普通 JSON 解析
+    try:
+        return _json_loads(text)
+    except Exception:
+        # 若不是合法 JSON，包装成预期结构
+        return {"summary": text, "keywords": []}
+
+
+async def summarize_many(
+    store_id: str,
+    keywords: List[str],
+    model: str,
+    max_tokens: int,
+    concurrency: int = 8,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> List[Union[Tuple[Optional[str], object], BaseException]]:
+    """并发请求多个关键词（最多 concurrency 个同时进行），结果与 keywords 一一对应，失败项为异常对象。"""
+    sem = asyncio.Semaphore(max(1, concurrency))
+    client = _get_client()
+
+    async def one(keyword: str) -> Tuple[Optional[str], object]:
+        async with sem:
+            return await _fetch_summary(client, store_id, keyword, model, max_tokens, on_delta)
+
+    return await asyncio.gather(*(one(k) for k in keywords), return_exceptions=True)
+
+
+def _batch_output_text(body: dict) -> Optional[str]:
+    """Batch 结果里是原始 JSON，没有 SDK 的 output_text 属性，手动拼出所有 output_text 片段。"""
+    texts = [
+        part.get("text") or ""
+        for item in body.get("output") or []
+        for part in item.get("content") or []
+        if part.get("type") == "output_text"
+    ]
+    return "".join(texts) or None
+
+
+async def summarize_batch(
+    store_id: str,
+    keywords: List[str],
+    model: str,
+    max_tokens: int,
+    poll_interval: float = BATCH_POLL_SECONDS,
+) -> List[Union[Tuple[Optional[str], object], BaseException]]:
+    """
+    通过 Batch API 提交全部关键词（费用约为同步接口一半，24h 内完成），轮询到结束后取回结果。
+    返回值与 summarize_many 相同。
+    """
+    lines = [
+        json.dumps(
+            {
+                "custom_id": f"k{i}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": _request_body(store_id, keyword, model, max_tokens),
+            },
+            ensure_ascii=False,
         )
-    except APIError as e:
-        print(f"❌ 调用接口失败: {e}", file=sys.stderr)
+        for i, keyword in enumerate(keywords)
+    ]
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+    client = _get_client()
+    input_file = await client.files.create(file=("summary_vs_batch.jsonl", payload), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    print(f"📦 已提交 batch {batch.id}（{len(keywords)} 个关键词），等待完成…", file=sys.stderr)
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+    if batch.status != "completed" or not (batch.output_file_id or batch.error_file_id):
+        print(f"❌ batch {batch.id} 未成功完成，状态：{batch.status}", file=sys.stderr)
         sys.exit(1)
 
-    text = getattr(resp, "output_text", None)
-    if not text and getattr(resp, "output", None):
-        try:
-            for item in resp.output:
-                if hasattr(item, "content"):
-                    for part in item.content:
-                        if getattr(part, "type", "") == "output_text":
-                            text = getattr(part, "text", None)
-                            if text:
-                                break
-                if text:
-                    break
-        except Exception:
-            text = None
-
-    if text:
-        # 尝试解析 JSON 输出
-        try:
-            parsed = json.loads(text)
-            print(json.dumps(parsed, ensure_ascii=False, indent=2))
-        except Exception:
-            # 若不是合法 JSON，包装成预期结构
-            print(json.dumps({"summary": text, "keywords": []}, ensure_ascii=False, indent=2))
-    else:
-        print("未获得文本回复，原始响应：")
-        print(resp)
+    results: List[Union[Tuple[Optional[str], object], BaseException]] = [
+        BatchItemError("batch 输出中缺少该请求的结果") for _ in keywords
+    ]
+    # 成功的请求在 output_file 中，失败的请求在 error_file 中，两者行格式相同
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            record = _json_loads(line)
+            idx = int(record["custom_id"][1:])
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                results[idx] = BatchItemError(str(record.get("error") or response.get("body")))
+                continue
+            body = response.get("body") or {}
+            results[idx] = (_batch_output_text(body), body)
+    return results
+
+
+def summarize(
+    store_id: str,
+    keywords: List[str],
+    model: str,
+    max_tokens: int,
+    concurrency: int = 8,
+    batch: bool = False,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    stream_items: bool = False,
+) -> None:
+    """
+    输出各关键词的知识点列表。单个关键词时直接输出其 JSON；
+    多个关键词时按输入顺序输出一个以关键词为键的 JSON 对象。
+    batch=True 时改走 Batch API（非交互的批量预处理）。
+    cache_dir 不为 None 时，相同 (model, store_id, 提示词) 直接复用上次通过校验的文本结果。
+    stream_items=True（仅单个关键词）时改为 JSON Lines：每个知识点一生成完整就输出一行。
+    已是 JSON 的关键词（如之前的输出）不请求接口，直接解析后输出。
+    """
+    scanner = _ItemScanner(_emit_point) if stream_items else None
+    results: List[Union[Tuple[Optional[str], object], BaseException, None]] = [None] * len(keywords)
+    cache_paths = [
+        cache_dir / f"{make_key(model, store_id, _PROMPT_INSTRUCTIONS, k)}.json" if cache_dir else None
+        for k in keywords
+    ]
+    todo: List[int] = []
+    for i, path in enumerate(cache_paths):
+        if _looks_like_json(keywords[i]):
+            # 传入的已是结构化的知识点（例如上一次的输出），直接本地解析输出，不请求接口
+            results[i] = (keywords[i], None)
+            print(f"ℹ️ 关键词已是 JSON，跳过接口调用（第 {i + 1} 个）", file=sys.stderr)
+        elif path is not None and path.exists():
+            results[i] = (path.read_text(encoding="utf-8"), None)
+            print(f"ℹ️ 使用缓存结果（{keywords[i]}）: {path}", file=sys.stderr)
+        else:
+            todo.append(i)
+
+    if todo:
+        todo_keywords = [keywords[i] for i in todo]
+        if batch:
+            fetched = _run(summarize_batch(store_id, todo_keywords, model, max_tokens))
+        else:
+            # 单个关键词时把生成中的文本实时写到 stderr，stdout 仍只输出最终 JSON；多个关键词并发时不回显，避免交错
+            on_delta = _echo_delta if len(keywords) == 1 else None
+            if scanner is not None:
+                on_delta = scanner.feed_and_echo
+            fetched = _run(summarize_many(store_id, todo_keywords, model, max_tokens, concurrency, on_delta))
+            if on_delta:
+                sys.stderr.write("\n")
+        for i, result in zip(todo, fetched):
+            results[i] = result
+            if (
+                cache_paths[i] is not None
+                and isinstance(result, tuple)
+                and result[0]
+                and _is_valid_summary(result[0])
+            ):
+                atomic_write_text(cache_paths[i], result[0])
+
+    if len(keywords) == 1:
+        result = results[0]
+        if isinstance(result, BaseException):
+            if not _is_api_error(result):
+                raise result
+            print(f"❌ 调用接口失败: {result}", file=sys.stderr)
+            sys.exit(1)
+        text, resp = result
+        if text and scanner is not None:
+            # 命中缓存或流式阶段未能逐条取出时，按最终结果补齐剩余条目
+            points = _validated_points(text)
+            if points is None:
+                # 不再把整段回复作为额外一行写到 stdout，避免下游读到重复或形状不同的行
+                print("❌ 回复不是有效的知识点列表，未输出剩余条目", file=sys.stderr)
+                sys.exit(1)
+            for item in points[scanner.count:]:
+                _emit_item(item)
+        elif text:
+            _print_json(_parse_summary(text))
+        else:
+            print("未获得文本回复，原始响应：")
+            print(resp)
+        return
+
+    output = {}
+    failed = False
+    for keyword, result in zip(keywords, results):
+        if isinstance(result, BaseException):
+            if not _is_api_error(result):
+                raise result
+            print(f"❌ 调用接口失败（{keyword}）: {result}", file=sys.stderr)
+            failed = True
+            continue
+        text, resp = result
+        if not text:
+            print(f"⚠️ 未获得文本回复（{keyword}），原始响应：{resp}", file=sys.stderr)
+            failed = True
+            continue
+        output[keyword] = _parse_summary(text)
+    _print_json(output)
+    if failed:
+        sys.exit(1)
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="从 vector store 获取材料摘要")
     parser.add_argument("--store-id", required=True, help="vector store id，例如 vs_xxx")
-    parser.add_argument("--keyword", required=True, help="关键词")
+    parser.add_argument("--keyword", nargs="+", required=True, help="关键词，可一次传入多个")
     parser.add_argument("--model", default="gpt-5-mini", help="模型名称，默认 gpt-5-mini")
     parser.add_argument("--max-tokens", type=int, default=8000, help="最大输出 tokens，默认 8000")
+    parser.add_argument("--concurrency", type=int, default=8, help="多个关键词时的最大并发请求数，默认 8")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="改用 Batch API 提交（费用减半，最长 24h 返回），适合离线批量预处理",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"结果缓存目录，默认 {DEFAULT_CACHE_DIR}",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不读写结果缓存，总是请求接口")
+    parser.add_argument(
+        "--stream-items",
+        action="store_true",
+        help="以 JSON Lines 逐条输出知识点，生成一条输出一条（仅单个关键词、非 --batch）",
+    )
     return parser
 
 
 def main(argv: Optional[list[str]] = None) -> None:
-    args = build_parser().parse_args(argv)
-    summarize(args.store_id, args.keyword, args.model, args.max_tokens)
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.stream_items and (args.batch or len(args.keyword) > 1):
+        parser.error("--stream-items 只支持单个关键词，且不能与 --batch 同时使用")
+    summarize(
+        args.store_id,
+        args.keyword,
+        args.model,
+        args.max_tokens,
+        args.concurrency,
+        args.batch,
+        cache_dir=None if args.no_cache else args.cache_dir.expanduser(),
+        stream_items=args.stream_items,
+    )
 
 
 if __name__ == "__main__":
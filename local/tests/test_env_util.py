@@ -0,0 +1,101 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+LOCAL_DIR = REPO_ROOT / "local"
+if str(LOCAL_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_DIR))
+
+from _env_util import get_env_value, load_env, read_env_file  # noqa: E402
+
+
+class EnvFileParserTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.path = Path(self._tmp.name) / ".env.local"
+
+    def write(self, text: str) -> None:
+        self.path.write_text(text, encoding="utf-8")
+
+    def test_skips_comments_blank_lines_and_lines_without_equals(self) -> None:
+        self.write("# OPENAI_API_KEY=commented\n\n   # INDENTED=comment\nNOT_A_PAIR\nA=1\n")
+
+        self.assertEqual(read_env_file(self.path), {"A": "1"})
+
+    def test_key_is_text_before_first_equals(self) -> None:
+        self.write("URL=https://example.com/?a=1&b=2\n  SPACED  =  value  \n")
+
+        self.assertEqual(
+            read_env_file(self.path),
+            {"URL": "https://example.com/?a=1&b=2", "SPACED": "value"},
+        )
+
+    def test_strips_quotes_and_crlf(self) -> None:
+        self.write("DOUBLE=\"dq\"\r\nSINGLE='sq'\r\nEMPTY=\r\n")
+
+        self.assertEqual(read_env_file(self.path), {"DOUBLE": "dq", "SINGLE": "sq", "EMPTY": ""})
+
+    def test_first_duplicate_key_wins(self) -> None:
+        self.write("KEY=first\nKEY=second\n")
+
+        self.assertEqual(read_env_file(self.path), {"KEY": "first"})
+
+    def test_missing_file_is_empty(self) -> None:
+        self.assertEqual(read_env_file(self.path), {})
+
+    def test_reparses_after_file_changes(self) -> None:
+        self.write("KEY=old\n")
+        self.assertEqual(read_env_file(self.path)["KEY"], "old")
+
+        self.write("KEY=new\n")
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(read_env_file(self.path)["KEY"], "new")
+
+
+class LoadEnvTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.path = Path(self._tmp.name) / ".env.local"
+        self.path.write_text("FROM_FILE=file\nSHARED=file\nAPI_KEY=file-key\n", encoding="utf-8")
+
+    def test_environment_wins_over_file(self) -> None:
+        with patch.dict(os.environ, {"SHARED": "env"}):
+            env = load_env(self.path)
+
+        self.assertEqual(env["SHARED"], "env")
+        self.assertEqual(env["FROM_FILE"], "file")
+
+    def test_returns_fresh_dict_and_sees_later_environment_changes(self) -> None:
+        first = load_env(self.path)
+        first["FROM_FILE"] = "mutated"
+
+        with patch.dict(os.environ, {"LATER": "1"}):
+            second = load_env(self.path)
+
+        self.assertEqual(second["FROM_FILE"], "file")
+        self.assertEqual(second["LATER"], "1")
+
+    def test_get_env_value_treats_empty_environment_value_as_unset(self) -> None:
+        with patch.dict(os.environ, {"API_KEY": ""}):
+            self.assertEqual(get_env_value(self.path, "API_KEY"), "file-key")
+        with patch.dict(os.environ, {"API_KEY": "env-key"}):
+            self.assertEqual(get_env_value(self.path, "API_KEY"), "env-key")
+
+    def test_get_env_value_tries_names_in_order(self) -> None:
+        with patch.dict(os.environ, {"ALIAS": "alias"}):
+            os.environ.pop("MISSING", None)
+            self.assertEqual(get_env_value(self.path, "MISSING", "ALIAS"), "alias")
+        self.assertIsNone(get_env_value(self.path, "MISSING"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+LOCAL_DIR = REPO_ROOT / "local"
+if str(LOCAL_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_DIR))
+
+from gen_deck_map_refs import split_map_refs  # noqa: E402
+
+
+REF = {"map_file": "geo_8_1", "name": "中国地形图", "page": 3, "position": "上"}
+
+
+class SplitMapRefsTests(unittest.TestCase):
+    def test_splits_batch_reply_per_card(self) -> None:
+        text = json.dumps({"c1": [REF], "c2": []}, ensure_ascii=False)
+
+        per_card = split_map_refs(text, ["c1", "c2"])
+
+        self.assertEqual(set(per_card), {"c1", "c2"})
+        self.assertEqual(json.loads(per_card["c1"]), [REF])
+        self.assertEqual(json.loads(per_card["c2"]), [])
+
+    def test_missing_or_non_list_cards_are_left_out(self) -> None:
+        text = json.dumps({"c1": [REF], "c2": {"oops": 1}, "other": [REF]}, ensure_ascii=False)
+
+        per_card = split_map_refs(text, ["c1", "c2", "c3"])
+
+        self.assertEqual(set(per_card), {"c1"})
+
+    def test_single_card_tolerates_misnamed_key(self) -> None:
+        text = json.dumps({"<卡片ID>": [REF]}, ensure_ascii=False)
+
+        per_card = split_map_refs(text, ["c1"])
+
+        self.assertEqual(json.loads(per_card["c1"]), [REF])
+
+    def test_misnamed_keys_are_not_remapped_for_batches(self) -> None:
+        text = json.dumps({"x1": [REF], "x2": [REF]}, ensure_ascii=False)
+
+        self.assertEqual(split_map_refs(text, ["c1", "c2"]), {})
+
+    def test_non_object_or_invalid_reply_returns_none(self) -> None:
+        for text in (None, "", "not json", json.dumps([REF]), "42"):
+            with self.subTest(text=text):
+                self.assertIsNone(split_map_refs(text, ["c1"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
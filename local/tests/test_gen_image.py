@@ -0,0 +1,94 @@
+import sys
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+LOCAL_DIR = REPO_ROOT / "local"
+if str(LOCAL_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_DIR))
+
+from gen_image import compress_to_jpeg  # noqa: E402
+
+
+def _encode(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _noise(width: int, height: int, seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), "RGB")
+
+
+def _gradient(width: int, height: int) -> Image.Image:
+    xs = np.linspace(0, 255, width, dtype=np.uint8)
+    ys = np.linspace(0, 255, height, dtype=np.uint8)
+    arr = np.stack(np.broadcast_arrays(xs[None, :], ys[:, None], xs[None, :] // 2 + ys[:, None] // 2), axis=-1)
+    return Image.fromarray(arr.astype(np.uint8), "RGB")
+
+
+class CompressToJpegTests(unittest.TestCase):
+    def test_small_rgb_jpeg_is_returned_unchanged(self) -> None:
+        raw = _encode(_gradient(200, 100), "JPEG", quality=70)
+
+        data, mime = compress_to_jpeg(raw, target_kb=50)
+
+        self.assertIs(data, raw)
+        self.assertEqual(mime, "image/jpeg")
+
+    def test_oversized_jpeg_is_scaled_to_max_dim_keeping_aspect_ratio(self) -> None:
+        raw = _encode(_gradient(4000, 3000), "JPEG", quality=90)
+
+        data, mime = compress_to_jpeg(raw, target_kb=500, max_dim=1600)
+
+        self.assertEqual(mime, "image/jpeg")
+        with Image.open(BytesIO(data)) as out:
+            self.assertEqual(out.format, "JPEG")
+            self.assertEqual(out.size, (1600, 1200))
+
+    def test_large_output_is_brought_under_target_size(self) -> None:
+        raw = _encode(_noise(1200, 900), "PNG")
+
+        data, _ = compress_to_jpeg(raw, target_kb=50)
+
+        self.assertLessEqual(len(data), 50 * 1024)
+        with Image.open(BytesIO(data)) as out:
+            self.assertGreaterEqual(max(out.size), 320)
+
+    def test_non_rgb_modes_are_converted_to_rgb_jpeg(self) -> None:
+        rgba = Image.new("RGBA", (64, 48), (255, 0, 0, 0))
+        palette = _gradient(64, 48).convert("P")
+        palette.info["transparency"] = 0
+        bilevel = _gradient(64, 48).convert("1")
+
+        for name, raw in (
+            ("RGBA", _encode(rgba, "PNG")),
+            ("P+transparency", _encode(palette, "PNG")),
+            ("1", _encode(bilevel, "PNG")),
+        ):
+            with self.subTest(mode=name):
+                data, mime = compress_to_jpeg(raw)
+                self.assertEqual(mime, "image/jpeg")
+                with Image.open(BytesIO(data)) as out:
+                    self.assertEqual(out.format, "JPEG")
+                    self.assertEqual(out.mode, "RGB")
+                    self.assertEqual(out.size, (64, 48))
+
+    def test_transparent_pixels_are_flattened_onto_white(self) -> None:
+        raw = _encode(Image.new("RGBA", (32, 32), (255, 0, 0, 0)), "PNG")
+
+        data, _ = compress_to_jpeg(raw)
+
+        with Image.open(BytesIO(data)) as out:
+            r, g, b = out.convert("RGB").getpixel((16, 16))
+        self.assertGreater(min(r, g, b), 240)
+
+
+if __name__ == "__main__":
+    unittest.main()
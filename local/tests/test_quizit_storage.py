@@ -0,0 +1,71 @@
+import hashlib
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+LOCAL_DIR = REPO_ROOT / "local"
+if str(LOCAL_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_DIR))
+
+import quizit_storage  # noqa: E402
+from quizit_storage import upload_many_if_changed  # noqa: E402
+
+
+def _sha(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class UploadManyIfChangedTests(unittest.TestCase):
+    def test_skips_unchanged_files_and_records_new_uploads(self) -> None:
+        items = [
+            ("c1", b"same", "back.dot"),
+            ("c2", b"changed", "back.dot"),
+            ("c3", b"new", "back.dot"),
+        ]
+        manifest = {"c1/back.dot": _sha(b"same"), "c2/back.dot": _sha(b"old")}
+
+        with patch.object(
+            quizit_storage,
+            "upload_to_storage_many",
+            side_effect=lambda todo: [f"{cid}/{name}" for cid, _, name in todo],
+        ) as upload:
+            results = upload_many_if_changed(manifest, items)
+
+        upload.assert_called_once_with(items[1:])
+        self.assertEqual(results, ["c1/back.dot", "c2/back.dot", "c3/back.dot"])
+        self.assertEqual(
+            manifest,
+            {
+                "c1/back.dot": _sha(b"same"),
+                "c2/back.dot": _sha(b"changed"),
+                "c3/back.dot": _sha(b"new"),
+            },
+        )
+
+    def test_failed_upload_is_not_recorded(self) -> None:
+        items = [("c1", b"data", "back.map"), ("c2", b"data", "back.map")]
+        manifest = {}
+
+        with patch.object(quizit_storage, "upload_to_storage_many", return_value=["c1/back.map", None]):
+            results = upload_many_if_changed(manifest, items)
+
+        self.assertEqual(results, ["c1/back.map", None])
+        self.assertEqual(manifest, {"c1/back.map": _sha(b"data")})
+
+    def test_nothing_uploaded_when_all_unchanged(self) -> None:
+        items = [("c1", b"data", "back.dot")]
+        manifest = {"c1/back.dot": _sha(b"data")}
+
+        with patch.object(quizit_storage, "upload_to_storage_many", return_value=[]) as upload:
+            results = upload_many_if_changed(manifest, items)
+
+        self.assertTrue(all(call.args == ([],) for call in upload.call_args_list))
+        self.assertEqual(results, ["c1/back.dot"])
+        self.assertEqual(manifest, {"c1/back.dot": _sha(b"data")})
+
+
+if __name__ == "__main__":
+    unittest.main()
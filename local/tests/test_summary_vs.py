@@ -0,0 +1,60 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+LOCAL_DIR = REPO_ROOT / "local"
+if str(LOCAL_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_DIR))
+
+from summary_vs import _ItemScanner  # noqa: E402
+
+
+def _feed_in_chunks(scanner: _ItemScanner, text: str, size: int) -> None:
+    for start in range(0, len(text), size):
+        scanner.feed(text[start:start + size])
+
+
+class ItemScannerTests(unittest.TestCase):
+    def test_emits_array_items_inside_wrapper_object(self) -> None:
+        items = []
+        scanner = _ItemScanner(items.append)
+        text = '{"knowledge_points": [{"name": "甲午战争", "type": "事件"}, {"name": "李鸿章", "type": "人物与组织"}]}'
+
+        _feed_in_chunks(scanner, text, 7)
+
+        self.assertEqual(
+            items,
+            [{"name": "甲午战争", "type": "事件"}, {"name": "李鸿章", "type": "人物与组织"}],
+        )
+        self.assertEqual(scanner.count, 2)
+
+    def test_emits_items_of_bare_array_one_character_at_a_time(self) -> None:
+        items = []
+        scanner = _ItemScanner(items.append)
+
+        _feed_in_chunks(scanner, '[{"name": "a}b", "type": "事件"},{"name": "c", "type": "事件"}]', 1)
+
+        self.assertEqual([item["name"] for item in items], ["a}b", "c"])
+
+    def test_incomplete_trailing_item_is_not_emitted(self) -> None:
+        items = []
+        scanner = _ItemScanner(items.append)
+
+        scanner.feed('[{"name": "a", "type": "事件"}, {"name": "b", "ty')
+
+        self.assertEqual(items, [{"name": "a", "type": "事件"}])
+        self.assertEqual(scanner.count, 1)
+
+    def test_nothing_emitted_before_array_starts(self) -> None:
+        items = []
+        scanner = _ItemScanner(items.append)
+
+        scanner.feed('{"note": {"x": 1}, ')
+
+        self.assertEqual(items, [])
+
+
+if __name__ == "__main__":
+    unittest.main()